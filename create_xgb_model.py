@@ -1,14 +1,14 @@
 import pandas as pd
 import xgboost as xgb
 from sklearn.model_selection import train_test_split
-import pickle
-import os
+
+from model_registry import SERVING_FEATURES, publish_bundle, compute_baseline_stats
 
 # Load data
 df = pd.read_csv('data/creditcard.csv')
 
 # Prepare features
-feature_columns = [f'V{i}' for i in range(1, 29)] + ['Amount']
+feature_columns = SERVING_FEATURES
 X = df[feature_columns]
 y = df['Class']
 
@@ -19,8 +19,8 @@ X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_
 model = xgb.XGBClassifier(random_state=42)
 model.fit(X_train, y_train)
 
-# Save model in XGBoost format
-os.makedirs('xgb_model', exist_ok=True)
-model.save_model('xgb_model/xgboost-model')
+# Publish the model as a registry bundle (UBJSON booster + manifest + SageMaker tarball)
+bundle_dir = publish_bundle(model, feature_order=feature_columns, baseline_stats=compute_baseline_stats(X_train),
+                            metadata={'source': 'create_xgb_model.py'})
 
-print("XGBoost model created successfully")
\ No newline at end of file
+print(f"XGBoost model created successfully in '{bundle_dir}'")
\ No newline at end of file
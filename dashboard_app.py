@@ -1,11 +1,22 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import os
 import requests
 import json
-import joblib
+import sys
 import shap
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from model_registry import load_bundle, load_legacy_model
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from feature_codec import decode_transaction
+from similar_cases import SimilarCaseIndex, build_index
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -17,6 +28,18 @@ st.set_page_config(
 
 API_ENDPOINT = "https://bnm4ojywee.execute-api.ap-south-1.amazonaws.com/" 
 FEEDBACK_ENDPOINT = f"{API_ENDPOINT}feedback"
+FEED_ENDPOINT = f"{API_ENDPOINT}predictions"
+FEED_PAGE_SIZE = 100
+FEED_MAX_PAGES_PER_POLL = 5
+FEED_WINDOW_SIZE = 500  # Most recent predictions kept in memory by the live feed
+API_TIMEOUT = (3.05, 15)  # (connect, read) seconds for every API call
+API_MAX_RETRIES = 3
+API_BACKOFF_FACTOR = 0.5  # Retries wait 0.5s, 1s, 2s
+BULK_MAX_WORKERS = 16  # Concurrent scoring requests in bulk investigations
+SCORE_BANDS = ['HIGH', 'MEDIUM', 'LOW']
+FEEDBACK_STATUSES = ['PENDING', 'VERIFIED']
+SIMILAR_CASES_INDEX_DIR = os.environ.get('SIMILAR_CASES_INDEX_DIR', 'similar_index')
+SIMILAR_CASES_K = 5
 
 # --- Asset Loading ---
 @st.cache_data
@@ -37,18 +60,64 @@ def load_data():
 
 @st.cache_resource
 def load_model_and_explainer():
-    """Loads the local XGBoost model and creates a SHAP explainer."""
+    """
+    Loads the latest model bundle from the registry (or, when none is published, e.g. in
+    an App Runner build, the committed legacy model) and creates a SHAP explainer.
+    """
     try:
-        model_path = os.path.join('model_artifacts', 'fraud_detection_model.joblib')
-        model = joblib.load(model_path)
-        explainer = shap.TreeExplainer(model)
+        try:
+            model = load_bundle()
+        except FileNotFoundError:
+            model = load_legacy_model()
+        explainer = shap.TreeExplainer(model.booster)
         return model, explainer
     except FileNotFoundError:
-        st.warning(f"Local model not found at '{model_path}'. Feature importance analysis will be disabled.")
+        st.warning("No model bundle found in the model registry and no legacy model in model_artifacts/. Feature importance analysis will be disabled.")
         return None, None
 
+@st.cache_resource
+def get_http_session():
+    """
+    Creates one pooled HTTP session shared by every API call, with retry/backoff on transient errors.
+    Only GETs are retried on error statuses and read errors; POSTs are retried only when the
+    connection failed, because a retried prediction request would record a second prediction.
+    """
+    retry = Retry(
+        total=API_MAX_RETRIES,
+        backoff_factor=API_BACKOFF_FACTOR,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BULK_MAX_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+@st.cache_resource
+def load_similar_case_index():
+    """Opens the similar-case index, building it from the dataset the first time."""
+    try:
+        return SimilarCaseIndex(SIMILAR_CASES_INDEX_DIR)
+    except FileNotFoundError:
+        if df is None:
+            st.warning("No similar-case index found. Similar past cases will not be shown.")
+            return None
+        features = [f'V{i}' for i in range(1, 29)] + ['Amount']
+        ids = [f"creditcard.csv:{row}" for row in df.index]
+        return build_index(SIMILAR_CASES_INDEX_DIR, df[features].to_numpy(), df['Class'].to_numpy(), ids, features)
+
+def own_case_ids(result):
+    """Index ids the investigated transaction itself may be stored under, so it is never its own similar case."""
+    ids = [result.get('prediction_id')]
+    if result['transaction'].get('index') is not None:
+        ids.append(f"creditcard.csv:{int(result['transaction']['index'])}")
+    return ids
+
 df, data_stats = load_data()
 model, explainer = load_model_and_explainer()
+similar_case_index = load_similar_case_index()
 
 # --- Helper Functions ---
 def run_rule_engine(transaction_data, stats):
@@ -60,29 +129,110 @@ def run_rule_engine(transaction_data, stats):
     if v14 < stats['V14_lower']: return f"Feature V14 value of {v14:.2f} is an extreme outlier."
     return None
 
+def call_prediction_api(session, transaction_data):
+    """
+    Scores one transaction through the API. Raises on failure and takes the session
+    from the caller, so it is safe to run in worker threads.
+    """
+    headers = {'Content-Type': 'application/json'}
+    response = session.post(API_ENDPOINT, data=json.dumps(transaction_data), headers=headers, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
 def get_ml_prediction(transaction_data):
     try:
-        headers = {'Content-Type': 'application/json'}
-        response = requests.post(API_ENDPOINT, data=json.dumps(transaction_data), headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return call_prediction_api(get_http_session(), transaction_data)
     except requests.exceptions.RequestException as e:
         st.error(f"API Error: Could not connect to the endpoint. Details: {e}")
         return None
 
-def submit_feedback(prediction_id, correct_label):
-    """Calls the new /feedback endpoint to submit a correction."""
+def submit_feedback(prediction_id, correct_label, transaction_data=None):
+    """Calls the new /feedback endpoint to submit a correction, and adds the verified case to the similar-case index."""
     try:
         payload = {"prediction_id": prediction_id, "correct_label": correct_label}
         headers = {'Content-Type': 'application/json'}
-        response = requests.post(FEEDBACK_ENDPOINT, data=json.dumps(payload), headers=headers)
+        response = get_http_session().post(FEEDBACK_ENDPOINT, data=json.dumps(payload), headers=headers, timeout=API_TIMEOUT)
         response.raise_for_status()
         st.toast(f"Feedback submitted successfully for {prediction_id}!", icon="🎉")
+        if similar_case_index is not None and transaction_data:
+            similar_case_index.add(similar_case_index.to_matrix([transaction_data]), [correct_label], [prediction_id])
         return response.json()
     except requests.exceptions.RequestException as e:
         st.error(f"API Error: Could not submit feedback. Details: {e}")
         return None
 
+def fetch_feed_page(since, bands, statuses):
+    """Calls the /predictions endpoint for one page of the live feed."""
+    try:
+        params = {'limit': FEED_PAGE_SIZE, 'bands': ','.join(bands), 'statuses': ','.join(statuses)}
+        if since:
+            params['since'] = since
+        response = get_http_session().get(FEED_ENDPOINT, params=params, timeout=API_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        st.error(f"API Error: Could not load the prediction feed. Details: {e}")
+        return None
+
+def poll_live_feed(bands, statuses):
+    """Pulls predictions from the feed cursor on into the bounded feed window, skipping ones already in it."""
+    filters = (tuple(bands), tuple(statuses))
+    if st.session_state.get('feed_filters') != filters:
+        # New filters start a new feed: the old window and cursor no longer apply.
+        st.session_state.feed_filters = filters
+        st.session_state.feed_window = deque(maxlen=FEED_WINDOW_SIZE)
+        st.session_state.feed_cursor = None
+
+    for _ in range(FEED_MAX_PAGES_PER_POLL):
+        page = fetch_feed_page(st.session_state.feed_cursor, bands, statuses)
+        if page is None:
+            break
+        # The cursor is inclusive, so a page can repeat items from the previous one.
+        seen = {item['predictionId'] for item in st.session_state.feed_window}
+        st.session_state.feed_window.extend(item for item in page['items'] if item['predictionId'] not in seen)
+        st.session_state.feed_cursor = page['cursor']
+        if not page['has_more']:
+            break
+
+def run_bulk_investigation(transactions):
+    """
+    Investigates many transactions at once. Rule-based detections are resolved locally;
+    the rest are scored concurrently and the results table fills in as responses arrive.
+    """
+    results = []
+    progress_bar = st.progress(0.0, text=f"Investigating {len(transactions)} transactions...")
+    results_placeholder = st.empty()
+
+    def record(result):
+        results.append(result)
+        progress_bar.progress(len(results) / len(transactions), text=f"Investigated {len(results)} of {len(transactions)} transactions")
+        results_placeholder.dataframe(pd.DataFrame(results), use_container_width=True, hide_index=True)
+
+    to_score = []
+    for label, payload in transactions:
+        rule_broken_reason = run_rule_engine(payload, data_stats)
+        if rule_broken_reason:
+            record({'Transaction': label, 'Source': 'Rule-Based Engine', 'Fraud': True, 'Fraud Score': 1.0,
+                    'Prediction ID': 'N/A-RuleBased', 'Details': rule_broken_reason})
+        else:
+            to_score.append((label, payload))
+
+    session = get_http_session()  # Resolved on the script thread; workers only use the session
+    with ThreadPoolExecutor(max_workers=BULK_MAX_WORKERS) as executor:
+        futures = {executor.submit(call_prediction_api, session, payload): label for label, payload in to_score}
+        for future in as_completed(futures):
+            try:
+                ml_result = future.result()
+                record({'Transaction': futures[future], 'Source': 'Machine Learning Model', 'Fraud': ml_result.get('is_fraud'),
+                        'Fraud Score': ml_result.get('fraud_score'), 'Prediction ID': ml_result.get('prediction_id'),
+                        'Details': ml_result.get('explanation', '')})
+            except requests.exceptions.RequestException as e:
+                record({'Transaction': futures[future], 'Source': 'API Error', 'Fraud': None, 'Fraud Score': None,
+                        'Prediction ID': None, 'Details': str(e)})
+
+    progress_bar.empty()
+    st.session_state.bulk_results = results
+
 # --- Main Application ---
 if df is not None:
     st.sidebar.title("Fraud Command Center")
@@ -96,17 +246,18 @@ if df is not None:
 
         with col_input:
             st.subheader("Investigation Method")
-            tab1, tab2 = st.tabs(["Manual Input", "Select from Table"])
+            tab1, tab2, tab3 = st.tabs(["Manual Input", "Select from Table", "Live Feed"])
 
             def process_investigation(payload):
                 with st.spinner("Analyzing transaction..."):
                     rule_broken_reason = run_rule_engine(payload, data_stats)
                     if rule_broken_reason:
-                        st.session_state.prediction_result = {'source': 'Rule-Based Engine', 'is_fraud': True, 'fraud_score': 1.0, 'explanation': rule_broken_reason, 'prediction_id': 'N/A-RuleBased'}
+                        st.session_state.prediction_result = {'source': 'Rule-Based Engine', 'is_fraud': True, 'fraud_score': 1.0, 'explanation': rule_broken_reason, 'prediction_id': 'N/A-RuleBased', 'transaction': payload}
                     else:
                         ml_result = get_ml_prediction(payload)
                         if ml_result:
                             ml_result['source'] = 'Machine Learning Model'
+                            ml_result['transaction'] = payload
                             st.session_state.prediction_result = ml_result
             
             with tab1:
@@ -134,20 +285,62 @@ if df is not None:
                             if key in st.session_state: del st.session_state[key]
             
             with tab2:
-                st.markdown("Select a transaction from the table below.")
+                st.markdown("Select one transaction, or several for a bulk investigation.")
                 sample_df = pd.concat([df[df['Class'] == 0].head(50), df[df['Class'] == 1].head(50)]).reset_index()
-                if 'selected_index' not in st.session_state: st.session_state.selected_index = None
                 
-                selected_indices = st.multiselect('Select a transaction:', options=sample_df.index, max_selections=1,
+                selected_indices = st.multiselect('Select transactions:', options=sample_df.index,
                     format_func=lambda x: f"Txn #{sample_df.loc[x, 'index']} - Amount: ${sample_df.loc[x, 'Amount']:.2f} ({'Fraud' if sample_df.loc[x, 'Class']==1 else 'Safe'})")
                 
-                if selected_indices: st.session_state.selected_index = selected_indices[0]
-                
-                if st.button("Investigate Selected Transaction"):
-                    if st.session_state.selected_index is not None:
-                        process_investigation(sample_df.loc[st.session_state.selected_index].to_dict())
+                if st.button("Investigate Selected Transactions"):
+                    if len(selected_indices) == 1:
+                        process_investigation(sample_df.loc[selected_indices[0]].to_dict())
+                    elif selected_indices:
+                        run_bulk_investigation([(f"Txn #{sample_df.loc[i, 'index']}", sample_df.loc[i].to_dict()) for i in selected_indices])
                     else:
                         st.warning("Please select a transaction first.")
+                elif st.session_state.get('bulk_results'):
+                    st.dataframe(pd.DataFrame(st.session_state.bulk_results), use_container_width=True, hide_index=True)
+
+            with tab3:
+                st.markdown("Recent predictions scored by the live API, newest first.")
+                feed_bands = st.multiselect("Score band", SCORE_BANDS, default=[])
+                feed_statuses = st.multiselect("Feedback status", FEEDBACK_STATUSES, default=[])
+
+                filters_changed = st.session_state.get('feed_filters') != (tuple(feed_bands), tuple(feed_statuses))
+                if st.button("Poll for New Predictions") or filters_changed:
+                    poll_live_feed(feed_bands, feed_statuses)
+
+                feed_items = list(reversed(st.session_state.get('feed_window', [])))
+                if feed_items:
+                    feed_df = pd.DataFrame([{
+                        'Prediction ID': item['predictionId'],
+                        'Timestamp': item['timestamp'],
+                        'Fraud Score': item.get('fraud_score'),
+                        'Band': item.get('score_band'),
+                        'Status': item.get('feedback_status'),
+                        'Amount': decode_transaction(item).get('Amount'),
+                    } for item in feed_items])
+                    st.dataframe(feed_df, use_container_width=True, hide_index=True)
+
+                    feed_by_id = {item['predictionId']: item for item in feed_items}
+                    selected_feed_ids = st.multiselect('Select a prediction:', options=list(feed_by_id), max_selections=1,
+                        format_func=lambda x: f"{feed_by_id[x]['timestamp']} - Score: {feed_by_id[x].get('fraud_score', 0):.4f} ({feed_by_id[x].get('feedback_status')})")
+
+                    if st.button("Review Selected Prediction"):
+                        if selected_feed_ids:
+                            item = feed_by_id[selected_feed_ids[0]]
+                            st.session_state.prediction_result = {
+                                'source': 'Live Feed',
+                                'prediction_id': item['predictionId'],
+                                'is_fraud': bool(item.get('is_fraud')),
+                                'fraud_score': item.get('fraud_score', 0),
+                                'explanation': item.get('explanation', 'N/A'),
+                                'transaction': decode_transaction(item),
+                            }
+                        else:
+                            st.warning("Please select a prediction first.")
+                else:
+                    st.info("No predictions in the feed yet.")
 
         with col_results:
             st.subheader("Investigation Results")
@@ -168,6 +361,18 @@ if df is not None:
                 st.subheader("AI Analyst Explanation:")
                 st.info(result.get('explanation', "No explanation provided."))
 
+                if similar_case_index is not None and result.get('transaction'):
+                    st.subheader("Similar Past Cases:")
+                    similar_cases = similar_case_index.search_transaction(result['transaction'], SIMILAR_CASES_K,
+                                                                          exclude_ids=own_case_ids(result))
+                    fraud_count = sum(case['label'] for case in similar_cases)
+                    st.caption(f"{fraud_count} of the {len(similar_cases)} most similar verified transactions were confirmed fraud.")
+                    st.dataframe(pd.DataFrame([{
+                        'Case': case['id'],
+                        'Label': 'Fraud' if case['label'] == 1 else 'Safe',
+                        'Distance': round(case['distance'], 3),
+                    } for case in similar_cases]), use_container_width=True, hide_index=True)
+
                 # --- NEW: Feedback Buttons ---
                 st.markdown("---")
                 st.subheader("Submit Feedback (Human-in-the-Loop)")
@@ -177,13 +382,13 @@ if df is not None:
                 with feedback_col1:
                     if st.button("Confirm as SAFE (Not Fraud)", key="safe_feedback"):
                         if result.get('prediction_id') != 'N/A-RuleBased':
-                            submit_feedback(result['prediction_id'], 0)
+                            submit_feedback(result['prediction_id'], 0, result.get('transaction'))
                         else:
                             st.warning("Cannot submit feedback for rule-based detections.")
                 with feedback_col2:
                     if st.button("Confirm as FRAUD", key="fraud_feedback"):
                         if result.get('prediction_id') != 'N/A-RuleBased':
-                            submit_feedback(result['prediction_id'], 1)
+                            submit_feedback(result['prediction_id'], 1, result.get('transaction'))
                         else:
                             st.warning("Cannot submit feedback for rule-based detections.")
             else:
@@ -197,7 +402,7 @@ if df is not None:
             st.subheader("Global Feature Importance (SHAP Analysis)")
             st.markdown("This chart shows the features that have the biggest impact on the model's predictions, averaged across all transactions.")
             
-            sample_for_shap = df.drop('Class', axis=1).sample(1000, random_state=42)
+            sample_for_shap = df[model.feature_order].sample(1000, random_state=42)
             shap_values = explainer(sample_for_shap)
 
             fig = go.Figure()
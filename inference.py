@@ -1,12 +1,15 @@
-import joblib
+import os
 import pandas as pd
 import numpy as np
 from io import StringIO
 
+from model_registry import MANIFEST_FILENAME, load_bundle, load_sagemaker_model
+
 def model_fn(model_dir):
-    """Load the model from the model_dir"""
-    model = joblib.load(f"{model_dir}/fraud_detection_model.joblib")
-    return model
+    """Load the model from the model_dir: a full bundle (cached by content hash) or the SageMaker artifact's booster"""
+    if os.path.exists(os.path.join(model_dir, MANIFEST_FILENAME)):
+        return load_bundle(model_dir)
+    return load_sagemaker_model(model_dir)
 
 def input_fn(request_body, request_content_type):
     """Parse input data"""
@@ -19,7 +22,7 @@ def input_fn(request_body, request_content_type):
 
 def predict_fn(input_data, model):
     """Make predictions"""
-    predictions = model.predict_proba(input_data)[:, 1]  # Get fraud probability
+    predictions = model.score(input_data)  # Get fraud probability
     return predictions
 
 def output_fn(prediction, content_type):
@@ -6,6 +6,7 @@ from aws_cdk import (
     aws_s3 as s3,
     aws_s3_assets as s3_assets,
     aws_lambda as _lambda,
+    aws_lambda_event_sources as lambda_event_sources,
     aws_iam as iam,
     aws_sagemaker as sagemaker,
     aws_apigatewayv2,
@@ -16,8 +17,84 @@ from aws_cdk import (
     aws_ec2,
 )
 from constructs import Construct
+import json
 import os
 
+MODEL_REGISTRY_DIR = os.path.join(os.getcwd(), "..", "model_registry")
+
+
+def latest_bundle_dir():
+    """Directory of the model registry's LATEST bundle (see model_registry.py), or None."""
+    latest_pointer = os.path.join(MODEL_REGISTRY_DIR, "LATEST")
+    if not os.path.exists(latest_pointer):
+        return None
+    with open(latest_pointer) as f:
+        return os.path.join(MODEL_REGISTRY_DIR, f.read().strip())
+
+
+def latest_model_artifact():
+    """Path of the LATEST bundle's SageMaker tarball, falling back to the legacy root model.tar.gz."""
+    bundle_dir = latest_bundle_dir()
+    if bundle_dir:
+        return os.path.join(bundle_dir, "model.tar.gz")
+    return os.path.join(os.getcwd(), "..", "model.tar.gz")
+
+
+def latest_bundle_manifest():
+    """Manifest of the LATEST bundle, or None."""
+    bundle_dir = latest_bundle_dir()
+    if not bundle_dir:
+        return None
+    with open(os.path.join(bundle_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+def model_feature_environment():
+    """Feature order of the LATEST bundle, so the proxy and the export job match a pruned model."""
+    manifest = latest_bundle_manifest()
+    if not manifest:
+        return {}
+    return {"MODEL_FEATURE_ORDER": ",".join(manifest["feature_order"])}
+
+
+def model_threshold_environment():
+    """Fraud threshold of the LATEST bundle, so the proxy flags transactions the way the model was tuned to."""
+    manifest = latest_bundle_manifest()
+    if not manifest:
+        return {}
+    return {"MODEL_FRAUD_THRESHOLD": str(manifest["thresholds"]["fraud"])}
+
+
+def fallback_rule_environment():
+    """
+    Outlier thresholds for the proxy's fallback rule engine, taken from the LATEST
+    bundle's baseline statistics. Without a bundle only the amount rule applies.
+    """
+    manifest = latest_bundle_manifest()
+    if not manifest:
+        return {}
+    baseline_stats = manifest["baseline_stats"]
+    environment = {}
+    if "V4" in baseline_stats:
+        environment["RULE_V4_UPPER"] = str(baseline_stats["V4"]["p999"])
+    if "V14" in baseline_stats:
+        environment["RULE_V14_LOWER"] = str(baseline_stats["V14"]["p001"])
+    return environment
+
+
+def training_hyperparameters():
+    """
+    Built-in XGBoost hyperparameters for the retraining job: the defaults, overridden
+    by those the LATEST bundle was trained with (e.g. a compact variant's tree count
+    and depth), so retraining does not grow a compact model back to the default size.
+    """
+    hyperparameters = {"objective": "binary:logistic", "eval_metric": "auc", "num_round": "100", "max_depth": "6"}
+    manifest = latest_bundle_manifest()
+    if manifest:
+        hyperparameters.update({name: str(value) for name, value in manifest["metadata"].get("hyperparameters", {}).items()})
+    return hyperparameters
+
+
 class InfraStack(Stack):
 
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
@@ -27,14 +104,33 @@ class InfraStack(Stack):
         predictions_table = dynamodb.Table(self, "AuraPredictionsTable",
             partition_key=dynamodb.Attribute(name="predictionId", type=dynamodb.AttributeType.STRING),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            # Predictions expire from the hot table and are archived to S3 from the stream (src/archive_predictions.py)
+            time_to_live_attribute="expires_at",
+            stream=dynamodb.StreamViewType.OLD_IMAGE,
             removal_policy=cdk.RemovalPolicy.DESTROY
         )
+        prediction_ttl_days = str(self.node.try_get_context("PREDICTION_TTL_DAYS") or "90")
+        # Time-ordered indexes for the dashboard's live feed (names match src/prediction_index.py).
+        # CloudFormation creates at most one GSI per table update, so a stack deployed before these
+        # indexes existed is upgraded in two deploys: first with --context FEED_INDEXES=BandFeedIndex,
+        # then without it (see "Upgrading an Existing Deployment" in the README).
+        feed_indexes = (self.node.try_get_context("FEED_INDEXES") or "BandFeedIndex,StatusFeedIndex").split(",")
+        if "BandFeedIndex" in feed_indexes:
+            predictions_table.add_global_secondary_index(index_name="BandFeedIndex",
+                partition_key=dynamodb.Attribute(name="band_bucket", type=dynamodb.AttributeType.STRING),
+                sort_key=dynamodb.Attribute(name="timestamp", type=dynamodb.AttributeType.STRING)
+            )
+        if "StatusFeedIndex" in feed_indexes:
+            predictions_table.add_global_secondary_index(index_name="StatusFeedIndex",
+                partition_key=dynamodb.Attribute(name="status_bucket", type=dynamodb.AttributeType.STRING),
+                sort_key=dynamodb.Attribute(name="timestamp", type=dynamodb.AttributeType.STRING)
+            )
         training_data_bucket = s3.Bucket(self, "AuraTrainingDataBucket",
             auto_delete_objects=True,
             removal_policy=cdk.RemovalPolicy.DESTROY
         )
         model_asset = s3_assets.Asset(self, "SageMakerModelAsset",
-            path=os.path.join(os.getcwd(), "..", "model.tar.gz")
+            path=latest_model_artifact()
         )
         sagemaker_role = iam.Role(self, "SageMakerExecutionRole",
             assumed_by=iam.ServicePrincipal("sagemaker.amazonaws.com"),
@@ -64,37 +160,75 @@ class InfraStack(Stack):
             endpoint_name="fraud-detection-endpoint"
         )
         proxy_lambda = _lambda.Function(self, "ProxyLambda", runtime=_lambda.Runtime.PYTHON_3_8, handler="lambda_function.handler", code=_lambda.Code.from_asset(os.path.join(os.getcwd(), "..", "src")),
-            timeout=cdk.Duration.seconds(30), environment={"SAGEMAKER_ENDPOINT_NAME": sagemaker_endpoint.endpoint_name, "GEMINI_API_KEY": self.node.try_get_context("GEMINI_API_KEY") or "", "PREDICTIONS_TABLE_NAME": predictions_table.table_name})
+            timeout=cdk.Duration.seconds(30), environment={"SAGEMAKER_ENDPOINT_NAME": sagemaker_endpoint.endpoint_name, "GEMINI_API_KEY": self.node.try_get_context("GEMINI_API_KEY") or "", "PREDICTIONS_TABLE_NAME": predictions_table.table_name,
+                "ENDPOINT_LATENCY_BUDGET_MS": "1500", "ENDPOINT_HEDGING": "true", "TRANSACTION_STORAGE_FORMAT": "packed", "PREDICTION_TTL_DAYS": prediction_ttl_days, **model_feature_environment(), **model_threshold_environment(), **fallback_rule_environment()})
         predictions_table.grant_read_write_data(proxy_lambda)
         proxy_lambda.add_to_role_policy(iam.PolicyStatement(actions=["sagemaker:InvokeEndpoint"], resources=[sagemaker_endpoint.ref]))
         
         feedback_lambda = _lambda.Function(self, "FeedbackLambda", runtime=_lambda.Runtime.PYTHON_3_8, handler="feedback_handler.handler", code=_lambda.Code.from_asset(os.path.join(os.getcwd(), "..", "src")),
-            timeout=cdk.Duration.seconds(30), environment={"PREDICTIONS_TABLE_NAME": predictions_table.table_name})
+            timeout=cdk.Duration.seconds(30), environment={"PREDICTIONS_TABLE_NAME": predictions_table.table_name, "PREDICTION_TTL_DAYS": prediction_ttl_days})
         predictions_table.grant_read_write_data(feedback_lambda)
+
+        feed_lambda = _lambda.Function(self, "FeedLambda", runtime=_lambda.Runtime.PYTHON_3_8, handler="feed_handler.handler", code=_lambda.Code.from_asset(os.path.join(os.getcwd(), "..", "src")),
+            timeout=cdk.Duration.seconds(10), environment={"PREDICTIONS_TABLE_NAME": predictions_table.table_name})
+        predictions_table.grant_read_data(feed_lambda)
         
         export_data_lambda = _lambda.Function(self, "ExportDataLambda", runtime=_lambda.Runtime.PYTHON_3_8, handler="export_data.handler", code=_lambda.Code.from_asset(os.path.join(os.getcwd(), "..", "src")),
-            timeout=cdk.Duration.seconds(60), memory_size=256, environment={"PREDICTIONS_TABLE_NAME": predictions_table.table_name, "TRAINING_DATA_BUCKET_NAME": training_data_bucket.bucket_name})
+            timeout=cdk.Duration.seconds(60), memory_size=256, environment={"PREDICTIONS_TABLE_NAME": predictions_table.table_name, "TRAINING_DATA_BUCKET_NAME": training_data_bucket.bucket_name, "PREDICTION_TTL_DAYS": prediction_ttl_days})
         predictions_table.grant_read_data(export_data_lambda)
         training_data_bucket.grant_write(export_data_lambda)
+
+        compaction_lambda = _lambda.Function(self, "CompactTrainingDataLambda", runtime=_lambda.Runtime.PYTHON_3_8, handler="compact_training_data.handler", code=_lambda.Code.from_asset(os.path.join(os.getcwd(), "..", "src")),
+            timeout=cdk.Duration.minutes(5), memory_size=512, environment={"TRAINING_DATA_BUCKET_NAME": training_data_bucket.bucket_name, "COMPACTION_TARGET_SHARD_MB": "64", **model_feature_environment()})
+        training_data_bucket.grant_read_write(compaction_lambda)
+        training_data_bucket.grant_delete(compaction_lambda)
+
+        # Parquet output needs pyarrow: pass the AWS SDK for pandas layer ARN of the region as context
+        # (without it the archiver writes gzip JSON lines instead).
+        pandas_layer_arn = self.node.try_get_context("AWS_SDK_PANDAS_LAYER_ARN")
+        archive_lambda = _lambda.Function(self, "ArchivePredictionsLambda", runtime=_lambda.Runtime.PYTHON_3_8, handler="archive_predictions.handler", code=_lambda.Code.from_asset(os.path.join(os.getcwd(), "..", "src")),
+            timeout=cdk.Duration.minutes(2), memory_size=512, environment={"TRAINING_DATA_BUCKET_NAME": training_data_bucket.bucket_name},
+            layers=[_lambda.LayerVersion.from_layer_version_arn(self, "AwsSdkPandasLayer", pandas_layer_arn)] if pandas_layer_arn else None)
+        training_data_bucket.grant_write(archive_lambda)
+        archive_lambda.add_event_source(lambda_event_sources.DynamoEventSource(predictions_table,
+            starting_position=_lambda.StartingPosition.TRIM_HORIZON,
+            batch_size=1000, max_batching_window=cdk.Duration.minutes(5),  # Few, large archive files
+            bisect_batch_on_error=True, retry_attempts=10,
+            # Only deletions made by TTL reach the archiver
+            filters=[_lambda.FilterCriteria.filter({
+                "eventName": _lambda.FilterRule.is_equal("REMOVE"),
+                "userIdentity": {
+                    "type": _lambda.FilterRule.is_equal("Service"),
+                    "principalId": _lambda.FilterRule.is_equal("dynamodb.amazonaws.com"),
+                },
+            })]))
         
         http_api = aws_apigatewayv2.HttpApi(self, "FraudDetectionApi")
         prediction_integration = aws_apigatewayv2_integrations.HttpLambdaIntegration("PredictionIntegration", proxy_lambda)
         http_api.add_routes(path="/", methods=[aws_apigatewayv2.HttpMethod.POST], integration=prediction_integration)
         feedback_integration = aws_apigatewayv2_integrations.HttpLambdaIntegration("FeedbackIntegration", feedback_lambda)
         http_api.add_routes(path="/feedback", methods=[aws_apigatewayv2.HttpMethod.POST], integration=feedback_integration)
+        feed_integration = aws_apigatewayv2_integrations.HttpLambdaIntegration("FeedIntegration", feed_lambda)
+        http_api.add_routes(path="/predictions", methods=[aws_apigatewayv2.HttpMethod.GET], integration=feed_integration)
 
         # --- 2. The Final, Production-Ready Step Functions State Machine ---
         export_data_job = sfn_tasks.LambdaInvoke(self, "ExportVerifiedData",
             lambda_function=export_data_lambda, result_path="$.ExportResult")
 
+        compact_data_job = sfn_tasks.LambdaInvoke(self, "CompactTrainingData",
+            lambda_function=compaction_lambda, result_path="$.CompactionResult")
+
         training_job = sfn_tasks.SageMakerCreateTrainingJob(self, "TrainNewModel",
             training_job_name=sfn.JsonPath.string_at("$$.Execution.Name"),
             algorithm_specification=sfn_tasks.AlgorithmSpecification(training_image=sfn_tasks.DockerImage.from_registry(image_uri)),
+            hyperparameters=training_hyperparameters(),
             input_data_config=[sfn_tasks.Channel(
                 channel_name="train",
+                content_type="text/csv",
+                # The compaction job's manifest lists the deduplicated shards (see src/compact_training_data.py)
                 data_source=sfn_tasks.DataSource(s3_data_source=sfn_tasks.S3DataSource(
-                    s3_data_type=sfn_tasks.S3DataType.S3_PREFIX,
-                    s3_location=sfn_tasks.S3Location.from_bucket(training_data_bucket, "training-data/"))))],
+                    s3_data_type=sfn_tasks.S3DataType.MANIFEST_FILE,
+                    s3_location=sfn_tasks.S3Location.from_bucket(training_data_bucket, "training-data/manifest/train.manifest"))))],
             output_data_config=sfn_tasks.OutputDataConfig(s3_output_location=sfn_tasks.S3Location.from_bucket(training_data_bucket, "training-output/")),
             role=sagemaker_role,
             resource_config=sfn_tasks.ResourceConfig(instance_count=1, instance_type=aws_ec2.InstanceType.of(aws_ec2.InstanceClass.M5, aws_ec2.InstanceSize.LARGE), volume_size=cdk.Size.gibibytes(10)),
@@ -135,9 +269,9 @@ class InfraStack(Stack):
         definition = export_data_job.next(parse_export_result).next(
             sfn.Choice(self, "CheckForNewData")
             .when(
-                # If the export lambda found records, proceed with training
+                # If the export lambda found records, compact them and proceed with training
                 sfn.Condition.number_greater_than("$.ParsedBody.record_count", 0),
-                training_job.next(create_model_job).next(create_endpoint_config_job).next(update_endpoint_job)
+                compact_data_job.next(training_job).next(create_model_job).next(create_endpoint_config_job).next(update_endpoint_job)
             )
             .otherwise(
                 # If no new records, go to the success state
@@ -13,3 +13,50 @@ def test_sqs_queue_created():
 #     template.has_resource_properties("AWS::SQS::Queue", {
 #         "VisibilityTimeout": 300
 #     })
+
+
+def test_predictions_table_has_feed_indexes():
+    app = core.App()
+    stack = InfraStack(app, "infra")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "GlobalSecondaryIndexes": assertions.Match.array_with([
+            assertions.Match.object_like({"IndexName": "BandFeedIndex"}),
+            assertions.Match.object_like({"IndexName": "StatusFeedIndex"}),
+        ])
+    })
+
+
+def test_feed_indexes_can_be_added_one_per_deploy():
+    app = core.App(context={"FEED_INDEXES": "BandFeedIndex"})
+    stack = InfraStack(app, "infra")
+    template = assertions.Template.from_stack(stack)
+
+    table = next(iter(template.find_resources("AWS::DynamoDB::Table").values()))
+    assert [index["IndexName"] for index in table["Properties"]["GlobalSecondaryIndexes"]] == ["BandFeedIndex"]
+
+
+def test_compaction_lambda_created():
+    app = core.App()
+    stack = InfraStack(app, "infra")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "compact_training_data.handler"
+    })
+
+
+def test_predictions_expire_to_archive():
+    app = core.App()
+    stack = InfraStack(app, "infra")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TimeToLiveSpecification": {"AttributeName": "expires_at", "Enabled": True},
+        "StreamSpecification": {"StreamViewType": "OLD_IMAGE"}
+    })
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "BatchSize": 1000,
+        "FilterCriteria": assertions.Match.any_value()
+    })
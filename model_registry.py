@@ -0,0 +1,311 @@
+"""
+Versioned model artifact registry.
+
+Each published model is one content-hashed bundle directory:
+
+    model_registry/
+    ├── LATEST                      # name of the newest bundle
+    └── <timestamp>-<hash[:12]>/
+        ├── model.ubj               # XGBoost booster in UBJSON (binary JSON) format
+        ├── manifest.json           # feature order, thresholds, baseline stats, metadata
+        └── model.tar.gz            # the same booster as JSON, alone, for the SageMaker XGBoost container
+
+The dashboard, `inference.model_fn` and the CDK stack all load models through
+this module. Loaded bundles are cached by content hash, so a warm process never
+deserializes the same model twice.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import tarfile
+from datetime import datetime
+
+REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', 'model_registry')
+LATEST_POINTER = 'LATEST'
+MODEL_FILENAME = 'model.ubj'
+MANIFEST_FILENAME = 'manifest.json'
+SAGEMAKER_ARTIFACT_FILENAME = 'model.tar.gz'
+SAGEMAKER_MODEL_FILENAME = 'xgboost-model'  # File name the SageMaker XGBoost container loads
+LEGACY_MODEL_PATH = os.path.join('model_artifacts', 'fraud_detection_model.joblib')  # Pre-registry model
+
+DEFAULT_THRESHOLDS = {'fraud': 0.5}
+
+# Features the serving path sends to the model (Time is not available at scoring time).
+SERVING_FEATURES = [f'V{i}' for i in range(1, 29)] + ['Amount']
+
+_BUNDLE_CACHE = {}
+
+
+class ModelBundle:
+    """A loaded model together with everything needed to score with it."""
+
+    def __init__(self, booster, manifest, path):
+        self.booster = booster
+        self.manifest = manifest
+        self.path = path
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def content_hash(self):
+        return self.manifest['content_hash']
+
+    @property
+    def feature_order(self):
+        return self.manifest['feature_order']
+
+    @property
+    def thresholds(self):
+        return self.manifest['thresholds']
+
+    @property
+    def baseline_stats(self):
+        return self.manifest['baseline_stats']
+
+    @property
+    def metadata(self):
+        return self.manifest['metadata']
+
+    def score(self, rows):
+        """
+        Returns the fraud probability of each row. `rows` is either a DataFrame
+        (columns are reordered to the bundle's feature order) or a 2D array
+        already in that order.
+        """
+        import numpy as np
+
+        if hasattr(rows, 'columns'):
+            rows = rows[self.feature_order].to_numpy()
+        return self.booster.inplace_predict(np.asarray(rows, dtype=np.float32))
+
+
+def _canonical_json(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _content_hash(model_bytes, feature_order, thresholds, baseline_stats):
+    """Hash of everything that changes what the bundle predicts."""
+    digest = hashlib.sha256(model_bytes)
+    digest.update(_canonical_json({
+        'feature_order': feature_order,
+        'thresholds': thresholds,
+        'baseline_stats': baseline_stats,
+    }))
+    return digest.hexdigest()
+
+
+def compute_baseline_stats(features):
+    """Per-feature mean, standard deviation and tail quantiles of a training DataFrame."""
+    return {
+        column: {
+            'mean': float(features[column].mean()),
+            'std': float(features[column].std()),
+            'p001': float(features[column].quantile(0.001)),
+            'p999': float(features[column].quantile(0.999)),
+        }
+        for column in features.columns
+    }
+
+
+def check_feature_order(feature_order):
+    """
+    Raises ValueError unless every feature is one the serving path sends. The
+    proxy, the exporter and the compaction job build rows in the bundle's feature
+    order from transactions that only ever carry SERVING_FEATURES.
+    """
+    unserved = [feature for feature in feature_order if feature not in SERVING_FEATURES]
+    if unserved:
+        raise ValueError(f"Cannot publish a model that uses features the serving path does not send: {', '.join(unserved)}. "
+                         "Train it on serving features only (V1-V28 and Amount; see scripts/train_model.py).")
+
+
+def _write_sagemaker_artifact(bundle_dir, booster):
+    """
+    Packages the booster for the built-in SageMaker XGBoost container: a single
+    `xgboost-model` file in JSON format, which every XGBoost version loads
+    regardless of file extension. Nothing else goes in the tarball, because the
+    container tries to load every file in the model directory as a booster.
+    """
+    model_bytes = bytes(booster.save_raw(raw_format='json'))
+    with tarfile.open(os.path.join(bundle_dir, SAGEMAKER_ARTIFACT_FILENAME), 'w:gz') as tar:
+        info = tarfile.TarInfo(SAGEMAKER_MODEL_FILENAME)
+        info.size = len(model_bytes)
+        tar.addfile(info, io.BytesIO(model_bytes))
+
+
+def publish_bundle(model, feature_order, baseline_stats=None, thresholds=None, metadata=None, registry_dir=REGISTRY_DIR):
+    """
+    Writes a new bundle for `model` (an XGBClassifier or Booster) and points LATEST at it.
+    Returns the bundle directory. Raises ValueError if `feature_order` is not a
+    subset of SERVING_FEATURES.
+    """
+    feature_order = list(feature_order)
+    check_feature_order(feature_order)
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    model_bytes = bytes(booster.save_raw(raw_format='ubj'))
+    thresholds = thresholds or dict(DEFAULT_THRESHOLDS)
+    baseline_stats = baseline_stats or {}
+
+    content_hash = _content_hash(model_bytes, feature_order, thresholds, baseline_stats)
+    version = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{content_hash[:12]}"
+    manifest = {
+        'version': version,
+        'content_hash': content_hash,
+        'model_file': MODEL_FILENAME,
+        'model_format': 'ubj',
+        'feature_order': feature_order,
+        'thresholds': thresholds,
+        'baseline_stats': baseline_stats,
+        'metadata': dict(metadata or {}, created_at=datetime.utcnow().isoformat()),
+    }
+
+    bundle_dir = os.path.join(registry_dir, version)
+    os.makedirs(bundle_dir, exist_ok=True)
+    with open(os.path.join(bundle_dir, MODEL_FILENAME), 'wb') as f:
+        f.write(model_bytes)
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    _write_sagemaker_artifact(bundle_dir, booster)
+
+    # Swap the pointer atomically so readers never see a half-written LATEST.
+    pointer_tmp = os.path.join(registry_dir, f".{LATEST_POINTER}.tmp")
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(registry_dir, LATEST_POINTER))
+
+    print(f"Published model bundle {version} to '{bundle_dir}'")
+    return bundle_dir
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """All published bundle versions, oldest first."""
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(registry_dir)
+        if os.path.isfile(os.path.join(registry_dir, name, MANIFEST_FILENAME))
+    )
+
+
+def resolve_bundle_dir(version=None, registry_dir=REGISTRY_DIR):
+    """Directory of `version`, or of the LATEST bundle when no version is given."""
+    if version is None:
+        with open(os.path.join(registry_dir, LATEST_POINTER)) as f:
+            version = f.read().strip()
+    return os.path.join(registry_dir, version)
+
+
+def read_manifest(bundle_dir):
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME)) as f:
+        return json.load(f)
+
+
+def load_bundle(bundle_dir=None, version=None, registry_dir=REGISTRY_DIR):
+    """
+    Loads a bundle, from `bundle_dir` if given (e.g. SageMaker's model_dir) or else
+    from the registry. Raises FileNotFoundError if there is nothing to load and
+    ValueError if the model file does not match the manifest's content hash.
+    """
+    bundle_dir = bundle_dir or resolve_bundle_dir(version, registry_dir)
+    manifest = read_manifest(bundle_dir)
+
+    cached = _BUNDLE_CACHE.get(manifest['content_hash'])
+    if cached is not None:
+        return cached
+
+    with open(os.path.join(bundle_dir, manifest['model_file']), 'rb') as f:
+        model_bytes = f.read()
+    actual_hash = _content_hash(model_bytes, manifest['feature_order'], manifest['thresholds'], manifest['baseline_stats'])
+    if actual_hash != manifest['content_hash']:
+        raise ValueError(f"Model bundle '{bundle_dir}' is corrupt: content hash {actual_hash} does not match its manifest.")
+
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(bytearray(model_bytes))
+    bundle = ModelBundle(booster, manifest, bundle_dir)
+    _BUNDLE_CACHE[manifest['content_hash']] = bundle
+    return bundle
+
+
+def _unpublished_bundle(booster, path, model_format):
+    """Wraps a booster that was never published, with default thresholds and no baseline stats."""
+    manifest = {
+        'version': None,
+        'content_hash': None,
+        'model_file': os.path.basename(path),
+        'model_format': model_format,
+        'feature_order': booster.feature_names or SERVING_FEATURES,
+        'thresholds': dict(DEFAULT_THRESHOLDS),
+        'baseline_stats': {},
+        'metadata': {},
+    }
+    return ModelBundle(booster, manifest, path)
+
+
+def load_sagemaker_model(model_dir):
+    """Loads the booster of an extracted SageMaker artifact (no manifest)."""
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(os.path.join(model_dir, SAGEMAKER_MODEL_FILENAME))
+    return _unpublished_bundle(booster, model_dir, 'json')
+
+
+def load_legacy_model(path=LEGACY_MODEL_PATH):
+    """
+    Loads the pre-registry joblib-pickled XGBClassifier, for environments where
+    no bundle has been published. Raises FileNotFoundError if it is missing too.
+    """
+    import joblib
+
+    return _unpublished_bundle(joblib.load(path).get_booster(), path, 'joblib')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned model bundles.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    publish_parser = subparsers.add_parser('publish', help="Publish an existing joblib/XGBoost model as a bundle.")
+    publish_parser.add_argument('--model', required=True,
+                                help="A joblib-pickled XGBClassifier or a native XGBoost model file, trained on "
+                                     "serving features only (the legacy joblib model also uses Time).")
+    publish_parser.add_argument('--data', default=os.path.join('data', 'creditcard.csv'),
+                                help="Training data used for the baseline statistics.")
+    subparsers.add_parser('list', help="List published bundle versions.")
+
+    args = parser.parse_args()
+    if args.command == 'list':
+        latest = None
+        if os.path.exists(os.path.join(REGISTRY_DIR, LATEST_POINTER)):
+            latest = os.path.basename(resolve_bundle_dir())
+        for version in list_versions():
+            print(f"{version}{'  (LATEST)' if version == latest else ''}")
+        return
+
+    import pandas as pd
+    import xgboost as xgb
+
+    if args.model.endswith('.joblib'):
+        import joblib
+        booster = joblib.load(args.model).get_booster()
+    else:
+        booster = xgb.Booster()
+        booster.load_model(args.model)
+
+    feature_order = booster.feature_names or [c for c in pd.read_csv(args.data, nrows=0).columns if c != 'Class']
+    try:
+        check_feature_order(feature_order)
+    except ValueError as e:
+        parser.error(str(e))
+    features = pd.read_csv(args.data, usecols=feature_order)
+    publish_bundle(booster, feature_order, baseline_stats=compute_baseline_stats(features),
+                   metadata={'source': args.model})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+"""
+ASGI scoring service for container deployment (App Runner, ECS, ...).
+
+Serves the same API as the proxy Lambda (`POST /` with one transaction, plus
+`POST /batch` with a list of them) using the Lambda's own request, rule-engine,
+Gemini and DynamoDB item logic from src/lambda_function.py, but without paying
+per-invocation overhead:
+
+- concurrent requests are collected into micro-batches (up to BATCH_MAX_ROWS
+  rows or BATCH_MAX_WAIT_MS) and scored with one model call;
+- the model stays resident (the LATEST registry bundle), or with
+  SCORING_BACKEND=endpoint each batch is one multi-row SageMaker call;
+- SageMaker, DynamoDB and Gemini are called with async clients, and
+  prediction records are written behind the response in BatchWriteItem calls;
+- on shutdown, pending batches are scored and pending records are written
+  before the process exits.
+
+Run:
+    uvicorn scoring_server:app --host 0.0.0.0 --port 8080 --workers 4
+"""
+import asyncio
+import json
+import math
+import os
+import sys
+import uuid
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import httpx
+import numpy as np
+from aiobotocore.session import get_session
+from boto3.dynamodb.types import TypeSerializer
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+import lambda_function as scoring
+from model_registry import load_bundle
+from resilient_invoker import CircuitBreaker
+
+SCORING_BACKEND = os.environ.get('SCORING_BACKEND', 'local')  # 'local' (resident model) or 'endpoint'
+BATCH_MAX_ROWS = int(os.environ.get('BATCH_MAX_ROWS', '64'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '5'))
+WRITE_BATCH_SIZE = 25  # BatchWriteItem limit
+WRITE_MAX_WAIT_MS = float(os.environ.get('WRITE_MAX_WAIT_MS', '200'))
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get('GEMINI_TIMEOUT_SECONDS', '10'))
+
+_serializer = TypeSerializer()
+
+
+class InvalidTransactionError(ValueError):
+    """A request whose transaction cannot be scored; answered with 400."""
+
+
+def parse_transaction(transaction_data, feature_columns=None):
+    """
+    Returns a copy of the transaction with every feature the scorer reads
+    (`feature_columns`, by default the proxy's) and every stored feature
+    converted to a finite float. Raises InvalidTransactionError otherwise, so
+    bad input fails only its own request instead of the micro-batch it would
+    have joined.
+    """
+    if not isinstance(transaction_data, dict):
+        raise InvalidTransactionError("Expected a JSON object of transaction features.")
+    columns = list(dict.fromkeys(scoring.DEFAULT_FEATURE_COLUMNS + list(feature_columns or scoring.FEATURE_COLUMNS)))
+    missing_columns = [col for col in columns if col not in transaction_data]
+    if missing_columns:
+        raise InvalidTransactionError(f"Missing features: {', '.join(missing_columns)}")
+
+    parsed = dict(transaction_data)
+    invalid_columns = []
+    for col in columns:
+        value = transaction_data[col]
+        try:
+            if isinstance(value, bool):
+                raise TypeError(col)
+            parsed[col] = float(value)
+        except (TypeError, ValueError):
+            invalid_columns.append(col)
+            continue
+        if not math.isfinite(parsed[col]):
+            invalid_columns.append(col)
+    if invalid_columns:
+        raise InvalidTransactionError(f"Features must be finite numbers: {', '.join(invalid_columns)}")
+    return parsed
+
+
+class MicroBatcher:
+    """
+    Collects concurrent `submit` calls into batches and scores each batch with
+    one `score_batch(transactions)` call, which returns `(score, source)` pairs.
+    """
+
+    def __init__(self, score_batch, max_rows=BATCH_MAX_ROWS, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.score_batch = score_batch
+        self.max_rows = max_rows
+        self.max_wait_s = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.closing = False
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, transaction_data):
+        if self.closing:
+            raise RuntimeError("Scoring server is shutting down.")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((transaction_data, future))
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        first = await self.queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = loop.time() + self.max_wait_s
+        while len(batch) < self.max_rows:
+            remaining = deadline - loop.time()
+            if remaining <= 0 and self.queue.empty():
+                break
+            try:
+                item = self.queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self.queue.get(), remaining)
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            if item is None:
+                self.queue.put_nowait(None)  # Let the outer loop see the shutdown marker
+                break
+            batch.append(item)
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if batch is None:
+                return
+            try:
+                results = await self.score_batch([transaction for transaction, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                print(f"Error scoring batch of {len(batch)}: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def close(self):
+        """Stops accepting work and scores everything already queued."""
+        self.closing = True
+        await self.queue.put(None)
+        if self._task:
+            await self._task
+
+
+class LocalModelScorer:
+    """Scores batches with the resident model bundle, off the event loop."""
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+        self.feature_columns = bundle.feature_order
+        self.fraud_threshold = bundle.thresholds['fraud']
+
+    async def __call__(self, transactions):
+        rows = np.array([[t[col] for col in self.bundle.feature_order] for t in transactions], dtype=np.float32)
+        scores = await asyncio.get_running_loop().run_in_executor(None, self.bundle.score, rows)
+        return [(float(score), 'local_model') for score in scores]
+
+
+class EndpointScorer:
+    """
+    Scores each batch with one multi-row SageMaker call, within the latency
+    budget. Failures, timeouts and an open circuit breaker fall back to the
+    rule engine, as in the Lambda.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.feature_columns = scoring.FEATURE_COLUMNS
+        self.fraud_threshold = scoring.FRAUD_THRESHOLD
+        self.breaker = CircuitBreaker(failure_threshold=scoring.BREAKER_FAILURE_THRESHOLD, reset_timeout_s=scoring.BREAKER_RESET_SECONDS)
+
+    async def _invoke(self, transactions):
+        body = '\n'.join(','.join(str(t[col]) for col in scoring.FEATURE_COLUMNS) for t in transactions)
+        response = await self.client.invoke_endpoint(EndpointName=scoring.SAGEMAKER_ENDPOINT_NAME, ContentType='text/csv', Body=body)
+        async with response['Body'] as stream:
+            payload = (await stream.read()).decode('utf-8')
+        return [float(value) for value in payload.replace('\n', ',').split(',') if value.strip()]
+
+    async def __call__(self, transactions):
+        if self.breaker.allow_request():
+            try:
+                scores = await asyncio.wait_for(self._invoke(transactions), scoring.ENDPOINT_LATENCY_BUDGET_MS / 1000)
+                if len(scores) != len(transactions):
+                    raise ValueError(f"Endpoint returned {len(scores)} scores for {len(transactions)} rows.")
+                self.breaker.record_success()
+                return [(score, 'endpoint') for score in scores]
+            except Exception as e:
+                print(f"Endpoint call failed: {e!r}")
+                self.breaker.record_failure()
+        return [(scoring.rule_engine_score(t), 'fallback') for t in transactions]
+
+
+class PredictionWriter:
+    """Write-behind queue of prediction items, flushed with BatchWriteItem."""
+
+    def __init__(self, client, table_name, max_wait_ms=WRITE_MAX_WAIT_MS):
+        self.client = client
+        self.table_name = table_name
+        self.max_wait_s = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, item):
+        self.queue.put_nowait(item)
+
+    async def _write(self, items):
+        requests = [{'PutRequest': {'Item': {k: _serializer.serialize(v) for k, v in item.items()}}} for item in items]
+        for attempt in range(5):
+            response = await self.client.batch_write_item(RequestItems={self.table_name: requests})
+            requests = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            if not requests:
+                return
+            await asyncio.sleep(0.05 * 2 ** attempt)
+        print(f"Error storing predictions in DynamoDB: {len(requests)} items left unprocessed")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self.queue.get()
+            if first is None:
+                break
+            items = [first]
+            deadline = loop.time() + self.max_wait_s
+            while len(items) < WRITE_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                try:
+                    item = self.queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self.queue.get(), remaining)
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                items.append(item)
+            try:
+                await self._write(items)
+            except Exception as e:
+                print(f"Error storing predictions in DynamoDB: {e}")
+
+    async def close(self):
+        """Writes everything already queued, then stops."""
+        await self.queue.put(None)
+        if self._task:
+            await self._task
+
+
+class ScoringService:
+    """Holds the clients and background workers for the lifetime of the process."""
+
+    def __init__(self):
+        self.exit_stack = AsyncExitStack()
+        self.batcher = None
+        self.writer = None
+        self.http = None
+        self.feature_columns = scoring.FEATURE_COLUMNS
+        self.fraud_threshold = scoring.FRAUD_THRESHOLD
+
+    async def start(self):
+        session = get_session()
+        if SCORING_BACKEND == 'endpoint':
+            sagemaker = await self.exit_stack.enter_async_context(session.create_client('sagemaker-runtime'))
+            scorer = EndpointScorer(sagemaker)
+        else:
+            bundle = load_bundle()
+            print(f"Loaded model bundle {bundle.version}")
+            scorer = LocalModelScorer(bundle)
+        self.feature_columns = scorer.feature_columns
+        self.fraud_threshold = scorer.fraud_threshold
+        self.batcher = MicroBatcher(scorer)
+        self.batcher.start()
+
+        if scoring.PREDICTIONS_TABLE_NAME:
+            dynamodb = await self.exit_stack.enter_async_context(session.create_client('dynamodb'))
+            self.writer = PredictionWriter(dynamodb, scoring.PREDICTIONS_TABLE_NAME)
+            self.writer.start()
+
+        self.http = await self.exit_stack.enter_async_context(httpx.AsyncClient(timeout=GEMINI_TIMEOUT_SECONDS))
+
+    async def stop(self):
+        await self.batcher.close()
+        if self.writer:
+            await self.writer.close()
+        await self.exit_stack.aclose()
+
+    async def explain(self, transaction_data, fraud_score):
+        if not scoring.GEMINI_API_KEY:
+            return 'Gemini api key not configured, cannot generate explainations'
+        similar_cases = await asyncio.get_running_loop().run_in_executor(None, scoring.find_similar_cases, transaction_data)
+        gemini_url, payload = scoring.build_gemini_request(transaction_data, fraud_score, similar_cases)
+        try:
+            response = await self.http.post(gemini_url, json=payload)
+            return scoring.parse_gemini_response(response.json())
+        except Exception as e:
+            print(f"Error calling Gemini API: {e}")
+            return "Could not generate an explanation due to an API error."
+
+    async def score(self, transaction_data):
+        """
+        Scores, explains and records one transaction; returns the API response body.
+        Raises InvalidTransactionError before batching if the transaction is invalid.
+        """
+        transaction_data = parse_transaction(transaction_data, self.feature_columns)
+        fraud_score, scoring_source = await self.batcher.submit(transaction_data)
+        is_fraud = fraud_score > self.fraud_threshold
+        explanation = 'N/A'
+        if scoring_source == 'fallback':
+            explanation = scoring.fallback_explanation(transaction_data)
+        elif is_fraud:
+            explanation = await self.explain(transaction_data, fraud_score)
+
+        prediction_id = str(uuid.uuid4())
+        if self.writer:
+            self.writer.put(scoring.build_prediction_item(prediction_id, transaction_data, fraud_score, is_fraud, explanation, scoring_source))
+
+        return {
+            'prediction_id': prediction_id,
+            'is_fraud': is_fraud,
+            'fraud_score': fraud_score,
+            'explanation': explanation,
+            'scoring_source': scoring_source
+        }
+
+
+service = ScoringService()
+
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*'}
+
+
+async def predict(request):
+    try:
+        transaction_data = json.loads(await request.body())
+        return JSONResponse(await service.score(transaction_data), headers=CORS_HEADERS)
+    except (json.JSONDecodeError, InvalidTransactionError) as e:
+        return JSONResponse({'error': str(e)}, status_code=400, headers=CORS_HEADERS)
+    except Exception as e:
+        print(f'Error processing request: {e}')
+        return JSONResponse({'error': 'Internal server error.'}, status_code=500, headers=CORS_HEADERS)
+
+
+async def predict_batch(request):
+    try:
+        try:
+            transactions = json.loads(await request.body())
+        except json.JSONDecodeError as e:
+            return JSONResponse({'error': str(e)}, status_code=400, headers=CORS_HEADERS)
+        if not isinstance(transactions, list):
+            return JSONResponse({'error': 'Expected a JSON list of transactions.'}, status_code=400, headers=CORS_HEADERS)
+        results = await asyncio.gather(*(service.score(t) for t in transactions), return_exceptions=True)
+        body = [result if not isinstance(result, Exception) else {'error': str(result)} for result in results]
+        return JSONResponse(body, headers=CORS_HEADERS)
+    except Exception as e:
+        print(f'Error processing batch request: {e}')
+        return JSONResponse({'error': 'Internal server error.'}, status_code=500, headers=CORS_HEADERS)
+
+
+async def health(request):
+    return JSONResponse({'status': 'ok'})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await service.start()
+    yield
+    # The server has stopped accepting requests; flush batches and pending writes.
+    await service.stop()
+
+
+app = Starlette(
+    routes=[
+        Route('/', predict, methods=['POST']),
+        Route('/batch', predict_batch, methods=['POST']),
+        Route('/health', health, methods=['GET']),
+    ],
+    lifespan=lifespan
+)
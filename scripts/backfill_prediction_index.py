@@ -0,0 +1,133 @@
+"""
+One-off backfill of the feed index and TTL attributes on existing prediction items.
+
+Predictions written before the live feed existed have no `day_bucket`,
+`score_band`, `band_bucket` or `status_bucket`, so BandFeedIndex and
+StatusFeedIndex never list them, and no `expires_at`, so TTL never archives
+them. This scans the table for such items and sets the attributes the proxy
+Lambda and the feedback handler now write (see src/prediction_index.py);
+DynamoDB then adds them to the indexes on its own.
+
+PENDING items expire PREDICTION_TTL_DAYS after their prediction, like new ones
+(items already past that are archived by TTL shortly after the backfill).
+VERIFIED items stay hot for another TTL period, filed under a status partition
+no older than the export job reads for that whole period, so every one of them
+is exported at least once before it is archived.
+
+Each update is conditional on the item still existing with the feedback status
+it was scanned with, so an item that expires or receives feedback while the
+backfill runs is skipped rather than recreated or given a stale status bucket.
+Re-running is safe: items that already have the attributes are not touched.
+
+Usage (from the repository root, after deploying the feed indexes; set
+PREDICTION_TTL_DAYS to the stack's value if it is not the default 90):
+    python scripts/backfill_prediction_index.py --table <PredictionsTableName> [--segments 4] [--dry-run]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from prediction_index import (
+    PREDICTION_TTL_DAYS, day_bucket, index_attributes, status_bucket, verified_expires_at
+)
+
+
+def needs_backfill():
+    """Filter matching items written without the feed index or TTL attributes."""
+    return Attr('band_bucket').not_exists() | Attr('status_bucket').not_exists() | Attr('expires_at').not_exists()
+
+
+def backfill_attributes(item, now=None):
+    """The attributes to set on a scanned item, or None if it cannot be indexed."""
+    if not item.get('timestamp'):
+        return None
+    now = now or time.time()
+    feedback_status = item.get('feedback_status', 'PENDING')
+    attributes = index_attributes(item['timestamp'], float(item.get('fraud_score', 0)), feedback_status)
+    if 'expires_at' in item:
+        return attributes
+
+    if feedback_status == 'VERIFIED':
+        oldest_day = (datetime.fromtimestamp(now, timezone.utc) - timedelta(days=PREDICTION_TTL_DAYS)).date().isoformat()
+        day = max(day_bucket(item['timestamp']), oldest_day)
+        attributes['status_bucket'] = status_bucket(day, 'VERIFIED')
+        attributes['expires_at'] = verified_expires_at(day, now)
+    else:
+        predicted_at = datetime.fromisoformat(item['timestamp']).replace(tzinfo=timezone.utc).timestamp()
+        attributes['expires_at'] = int(predicted_at) + PREDICTION_TTL_DAYS * 86400
+    return attributes
+
+
+def backfill_item(table, item, dry_run=False):
+    """Sets the missing attributes on one item. Returns 'updated', 'skipped' or 'changed'."""
+    attributes = backfill_attributes(item)
+    if attributes is None:
+        return 'skipped'
+    if dry_run:
+        return 'updated'
+
+    names = {f"#a{i}": name for i, name in enumerate(attributes)}
+    values = {f":a{i}": value for i, value in enumerate(attributes.values())}
+    values[':status'] = item.get('feedback_status', 'PENDING')
+    try:
+        table.update_item(
+            Key={'predictionId': item['predictionId']},
+            UpdateExpression="SET " + ", ".join(f"#a{i} = :a{i}" for i in range(len(attributes))),
+            # Not if the item expired or its feedback status changed since it was scanned
+            ConditionExpression="attribute_exists(predictionId) AND "
+                                "(feedback_status = :status OR attribute_not_exists(feedback_status))",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return 'changed'
+    return 'updated'
+
+
+def backfill_segment(table, segment, total_segments, dry_run=False):
+    """Scans one parallel-scan segment and backfills its items; returns outcome counts."""
+    counts = {'updated': 0, 'skipped': 0, 'changed': 0}
+    scan_kwargs = {
+        'FilterExpression': needs_backfill(),
+        'Segment': segment,
+        'TotalSegments': total_segments,
+    }
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            counts[backfill_item(table, item, dry_run)] += 1
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return counts
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+
+def backfill(table, segments=4, dry_run=False):
+    """Backfills the whole table with `segments` parallel scans; returns outcome counts."""
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        results = list(pool.map(lambda segment: backfill_segment(table, segment, segments, dry_run), range(segments)))
+    return {outcome: sum(counts[outcome] for counts in results) for outcome in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill feed index and TTL attributes on existing predictions.")
+    parser.add_argument('--table', required=True, help="Name of the predictions table (stack output PredictionsTableName).")
+    parser.add_argument('--segments', type=int, default=4, help="Parallel scan segments.")
+    parser.add_argument('--dry-run', action='store_true', help="Count the items that would be updated without writing.")
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb').Table(args.table)
+    counts = backfill(table, args.segments, args.dry_run)
+    print(f"{'Would update' if args.dry_run else 'Updated'} {counts['updated']} items; "
+          f"skipped {counts['skipped']} without a timestamp and {counts['changed']} that changed during the scan.")
+
+
+if __name__ == '__main__':
+    main()
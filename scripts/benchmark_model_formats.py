@@ -0,0 +1,99 @@
+"""
+Compares artifact size and load time of the model across serialization formats:
+joblib/pickle, XGBoost JSON, XGBoost UBJSON and the model registry bundle
+(cold load and warm, cache-hit load).
+
+Usage (from the repository root):
+    python scripts/benchmark_model_formats.py [--version <bundle version>] [--repeats 20]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import model_registry
+from model_registry import load_bundle, resolve_bundle_dir
+
+
+def time_load(load, repeats):
+    """Median and best wall-clock time of `load()` in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        load()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), min(timings)
+
+
+def load_booster(path):
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return booster
+
+
+def load_bundle_cold(bundle_dir):
+    model_registry._BUNDLE_CACHE.clear()
+    return load_bundle(bundle_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model artifact formats.")
+    parser.add_argument('--version', default=None, help="Bundle version to benchmark (default: LATEST).")
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--data', default=os.path.join('data', 'creditcard.csv'))
+    args = parser.parse_args()
+
+    bundle_dir = resolve_bundle_dir(args.version)
+    bundle = load_bundle(bundle_dir)
+    booster = bundle.booster
+    sample = pd.read_csv(args.data, usecols=bundle.feature_order, nrows=1000)[bundle.feature_order].to_numpy(dtype=np.float32)
+    expected = bundle.score(sample)
+
+    work_dir = tempfile.mkdtemp(prefix='model-formats-')
+    try:
+        paths = {
+            'joblib (pickle)': os.path.join(work_dir, 'model.joblib'),
+            'xgboost json': os.path.join(work_dir, 'model.json'),
+            'xgboost ubj': os.path.join(work_dir, 'model.ubj'),
+        }
+        joblib.dump(booster, paths['joblib (pickle)'])
+        booster.save_model(paths['xgboost json'])
+        booster.save_model(paths['xgboost ubj'])
+
+        loaders = {
+            'joblib (pickle)': lambda: joblib.load(paths['joblib (pickle)']),
+            'xgboost json': lambda: load_booster(paths['xgboost json']),
+            'xgboost ubj': lambda: load_booster(paths['xgboost ubj']),
+            'registry bundle (cold)': lambda: load_bundle_cold(bundle_dir),
+            'registry bundle (warm)': lambda: load_bundle(bundle_dir),
+        }
+        bundle_size = sum(
+            os.path.getsize(os.path.join(bundle_dir, name))
+            for name in (model_registry.MODEL_FILENAME, model_registry.MANIFEST_FILENAME)
+        )
+        sizes = {name: os.path.getsize(path) for name, path in paths.items()}
+        sizes['registry bundle (cold)'] = sizes['registry bundle (warm)'] = bundle_size
+
+        print(f"Model bundle {bundle.version} ({len(bundle.feature_order)} features), {args.repeats} loads per format\n")
+        print(f"{'Format':<24}{'Size (KB)':>12}{'Median load (ms)':>20}{'Best load (ms)':>18}  Scores match")
+        for name, load in loaders.items():
+            median_ms, best_ms = time_load(load, args.repeats)
+            loaded = load()
+            model = loaded.booster if hasattr(loaded, 'booster') else loaded
+            matches = np.allclose(model.inplace_predict(sample), expected)
+            print(f"{name:<24}{sizes[name] / 1024:>12.1f}{median_ms:>20.2f}{best_ms:>18.2f}  {matches}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
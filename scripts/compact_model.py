@@ -0,0 +1,157 @@
+"""
+Builds compact, latency-optimized variants of the fraud model and benchmarks
+each one's accuracy (AUC, PR-AUC) against its scoring latency.
+
+Variants are a grid of fewer trees x shallower trees x the top-k features by
+gain importance. Scoring uses float32 inputs with `inplace_predict`, the same
+call the model registry's bundles use, so no DMatrix or float64 copy is made
+per request. The fastest variant whose AUC and PR-AUC stay within the allowed
+drop from the default model is published to the model registry, together with
+its tree count and depth, which the retraining pipeline trains with from then on.
+
+Usage (from the repository root):
+    python scripts/compact_model.py [--max-auc-drop 0.002] [--max-pr-auc-drop 0.01] [--no-publish]
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from imblearn.over_sampling import SMOTE
+from sklearn.metrics import average_precision_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from model_registry import SERVING_FEATURES, compute_baseline_stats, publish_bundle
+
+BATCH_SIZE = 1000
+DEFAULT_VARIANT = (100, 6, len(SERVING_FEATURES))  # Trees, depth and features of the default model
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+def median_latency_ms(booster, rows, repeats):
+    """Median wall-clock time of one `inplace_predict` call on `rows`."""
+    booster.inplace_predict(rows)  # Warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        booster.inplace_predict(rows)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def train_variant(X_train, y_train, features, n_estimators, max_depth):
+    model = xgb.XGBClassifier(
+        objective='binary:logistic',
+        eval_metric='auc',
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        random_state=42
+    )
+    model.fit(X_train[features], y_train)
+    return model.get_booster()
+
+
+def evaluate_variant(booster, X_test, y_test, features, row_repeats, batch_repeats):
+    test_rows = np.ascontiguousarray(X_test[features].to_numpy(dtype=np.float32))
+    scores = booster.inplace_predict(test_rows)
+    batch_ms = median_latency_ms(booster, test_rows[:BATCH_SIZE], batch_repeats)
+    return {
+        'auc': roc_auc_score(y_test, scores),
+        'pr_auc': average_precision_score(y_test, scores),
+        'row_us': median_latency_ms(booster, test_rows[:1], row_repeats) * 1000,
+        'batch_ms': batch_ms,
+        'batch_row_us': batch_ms * 1000 / BATCH_SIZE,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and benchmark compact model variants.")
+    parser.add_argument('--data', default=os.path.join('data', 'creditcard.csv'))
+    parser.add_argument('--n-estimators', type=parse_int_list, default=[100, 50, 25])
+    parser.add_argument('--max-depths', type=parse_int_list, default=[6, 4, 3])
+    parser.add_argument('--top-k', type=parse_int_list, default=[len(SERVING_FEATURES), 20, 12],
+                        help="Numbers of most important features to keep.")
+    parser.add_argument('--max-auc-drop', type=float, default=0.002)
+    parser.add_argument('--max-pr-auc-drop', type=float, default=0.01)
+    parser.add_argument('--row-repeats', type=int, default=2000)
+    parser.add_argument('--batch-repeats', type=int, default=50)
+    parser.add_argument('--no-publish', action='store_true', help="Only print the benchmark.")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data)
+    X = df[SERVING_FEATURES]
+    y = df['Class']
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42, stratify=y)
+
+    print("Applying SMOTE to the training data... (This may take a moment)")
+    X_train_smote, y_train_smote = SMOTE(random_state=42).fit_resample(X_train, y_train)
+
+    print("Training the default model (100 trees, depth 6, all serving features)...")
+    baseline = train_variant(X_train_smote, y_train_smote, SERVING_FEATURES, *DEFAULT_VARIANT[:2])
+    baseline_metrics = evaluate_variant(baseline, X_test, y_test, SERVING_FEATURES, args.row_repeats, args.batch_repeats)
+
+    gain = baseline.get_score(importance_type='gain')
+    ranked_features = sorted(SERVING_FEATURES, key=lambda feature: gain.get(feature, 0.0), reverse=True)
+    print(f"Features by gain importance: {', '.join(ranked_features)}")
+
+    # The default model is always a candidate, whatever grid is given, so one always qualifies.
+    variants = dict.fromkeys([DEFAULT_VARIANT] + list(itertools.product(args.n_estimators, args.max_depths, args.top_k)))
+    results = []
+    for n_estimators, max_depth, top_k in variants:
+        features = ranked_features[:top_k]
+        if (n_estimators, max_depth, top_k) == DEFAULT_VARIANT:
+            booster, metrics = baseline, baseline_metrics
+        else:
+            booster = train_variant(X_train_smote, y_train_smote, features, n_estimators, max_depth)
+            metrics = evaluate_variant(booster, X_test, y_test, features, args.row_repeats, args.batch_repeats)
+        metrics['eligible'] = (
+            metrics['auc'] >= baseline_metrics['auc'] - args.max_auc_drop
+            and metrics['pr_auc'] >= baseline_metrics['pr_auc'] - args.max_pr_auc_drop
+        )
+        results.append(((n_estimators, max_depth, top_k), features, booster, metrics))
+
+    results.sort(key=lambda result: (result[3]['row_us'], result[3]['batch_ms']))
+    print(f"\n{'Trees':>6}{'Depth':>7}{'Features':>10}{'AUC':>9}{'PR-AUC':>9}{'Row (us)':>11}"
+          f"{'Batch (ms)':>12}{'Batch/row (us)':>16}  Within tolerance")
+    for (n_estimators, max_depth, top_k), _, _, m in results:
+        print(f"{n_estimators:>6}{max_depth:>7}{top_k:>10}{m['auc']:>9.4f}{m['pr_auc']:>9.4f}{m['row_us']:>11.1f}"
+              f"{m['batch_ms']:>12.2f}{m['batch_row_us']:>16.2f}  {m['eligible']}")
+
+    eligible = [result for result in results if result[3]['eligible']]
+    (n_estimators, max_depth, top_k), features, booster, metrics = eligible[0]  # The default model always qualifies
+    print(f"\nBest variant: {n_estimators} trees, depth {max_depth}, {top_k} features "
+          f"({metrics['row_us']:.1f} us/row vs {baseline_metrics['row_us']:.1f} us/row for the default model)")
+
+    if args.no_publish:
+        return
+
+    publish_bundle(
+        booster,
+        feature_order=features,
+        # Stats of every serving feature, not just the kept ones: the fallback rule
+        # engine's V4/V14 thresholds come from here even when the model drops them.
+        baseline_stats=compute_baseline_stats(X_train[SERVING_FEATURES]),
+        metadata={
+            'source': 'scripts/compact_model.py',
+            # Built-in SageMaker XGBoost names; the retraining job trains with these.
+            'hyperparameters': {'num_round': n_estimators, 'max_depth': max_depth},
+            'test_auc': float(metrics['auc']),
+            'test_pr_auc': float(metrics['pr_auc']),
+            'row_latency_us': float(metrics['row_us']),
+            'batch_latency_ms': float(metrics['batch_ms']),
+            'batch_size': BATCH_SIZE,
+        }
+    )
+
+
+if __name__ == '__main__':
+    main()
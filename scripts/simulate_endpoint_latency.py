@@ -0,0 +1,109 @@
+"""
+Drives the proxy's ResilientInvoker against a local fake endpoint that injects
+tail latency, errors and an outage, and prints the caller-side latency
+percentiles together with the invoker's counters.
+
+Usage (from the repository root):
+    python scripts/simulate_endpoint_latency.py [--requests 500] [--budget-ms 300] [--interval-ms 10] [--no-hedging]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from resilient_invoker import CircuitBreaker, ResilientInvoker
+
+
+class FakeEndpoint:
+    """
+    Scores after `base_ms`, with occasional slow calls and errors. Between
+    `outage_start_s` and `outage_start_s + outage_length_s` (seconds of `clock`
+    after the first call) every call hangs for `tail_ms` and then fails. `plan`
+    optionally fixes the outcome of the first calls ('ok', 'slow' or 'error'),
+    which makes the endpoint deterministic for tests.
+    """
+
+    def __init__(self, base_ms=15, tail_probability=0.02, tail_ms=800, error_probability=0.01,
+                 outage_start_s=None, outage_length_s=0, seed=7, plan=None, clock=time.monotonic):
+        self.base_ms = base_ms
+        self.tail_probability = tail_probability
+        self.tail_ms = tail_ms
+        self.error_probability = error_probability
+        self.outage_start_s = outage_start_s
+        self.outage_length_s = outage_length_s
+        self.random = random.Random(seed)
+        self.plan = list(plan or [])
+        self.clock = clock
+        self.calls = 0
+        self.started_at = None
+        self._lock = threading.Lock()
+
+    def _outcome(self):
+        with self._lock:
+            self.calls += 1
+            if self.started_at is None:
+                self.started_at = self.clock()
+            elapsed_s = self.clock() - self.started_at
+            if self.outage_start_s is not None and self.outage_start_s <= elapsed_s < self.outage_start_s + self.outage_length_s:
+                return 'outage'
+            if self.plan:
+                return self.plan.pop(0)
+            if self.random.random() < self.error_probability:
+                return 'error'
+            return 'slow' if self.random.random() < self.tail_probability else 'ok'
+
+    def __call__(self, transaction_data):
+        outcome = self._outcome()
+        if outcome == 'outage':
+            time.sleep(self.tail_ms / 1000)
+            raise ConnectionError("Fake endpoint outage")
+        if outcome == 'error':
+            raise ConnectionError("Fake endpoint error")
+        delay_ms = self.tail_ms if outcome == 'slow' else self.base_ms
+        time.sleep(delay_ms * self.random.uniform(0.8, 1.2) / 1000)
+        return 0.01
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate endpoint tail latency against the resilient invoker.")
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--budget-ms', type=int, default=300)
+    parser.add_argument('--interval-ms', type=int, default=10, help="Pause between requests.")
+    parser.add_argument('--no-hedging', action='store_true')
+    args = parser.parse_args()
+
+    endpoint = FakeEndpoint(outage_start_s=2.0, outage_length_s=1.0)
+    invoker = ResilientInvoker(
+        endpoint,
+        lambda transaction_data: 0.0,
+        latency_budget_ms=args.budget_ms,
+        hedging=not args.no_hedging,
+        breaker=CircuitBreaker(failure_threshold=5, reset_timeout_s=0.5)
+    )
+
+    latencies = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        invoker.invoke({})
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(args.interval_ms / 1000)
+
+    print(f"Caller latency over {args.requests} requests (budget {args.budget_ms} ms, hedging {'off' if args.no_hedging else 'on'}):")
+    for pct in (50, 95, 99, 100):
+        print(f"  p{pct}: {percentile(latencies, pct):.1f} ms")
+    print(f"Endpoint calls made: {endpoint.calls}")
+    print("Invoker counters:")
+    for name, value in sorted(invoker.snapshot().items()):
+        print(f"  {name}: {value}")
+
+
+if __name__ == '__main__':
+    main()
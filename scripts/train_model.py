@@ -4,7 +4,11 @@ import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
 from imblearn.over_sampling import SMOTE
-import joblib # To save the model
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from model_registry import SERVING_FEATURES, publish_bundle, compute_baseline_stats
 
 try:
     df = pd.read_csv('data/creditcard.csv')
@@ -14,7 +18,7 @@ except FileNotFoundError:
     print("Error: 'creditcard.csv' not found. Please make sure it's in the same folder as this script.")
     exit()
 
-X = df.drop('Class', axis=1)
+X = df[SERVING_FEATURES]
 y = df['Class']
 
 print("\nClass distribution before SMOTE:")
@@ -52,23 +56,17 @@ print(classification_report(y_test, y_pred_test))
 print("\nConfusion Matrix:")
 print(confusion_matrix(y_test, y_pred_test))
 
+auc = roc_auc_score(y_test, y_pred_proba_test)
 print("\nArea Under ROC Curve (AUC-ROC):")
-print(roc_auc_score(y_test, y_pred_proba_test))
+print(auc)
 print("--------------------------")
 
-model_filename = 'fraud_detection_model.joblib'
-joblib.dump(model, model_filename)
-print(f"\nModel saved successfully as '{model_filename}'")
-
-import os
-os.makedirs('model_artifacts', exist_ok=True)
-joblib.dump(model, 'model_artifacts/fraud_detection_model.joblib')
-
-os.makedirs('xgb_model', exist_ok=True)
-model.save_model('xgb_model/xgboost-model')
-print("Model also saved in XGBoost format for SageMaker deployment")
-
-import tarfile
-with tarfile.open('model.tar.gz', 'w:gz') as tar:
-    tar.add('xgb_model/xgboost-model', arcname='xgboost-model')
-print("Model packaged as 'model.tar.gz' for SageMaker deployment")
+# One bundle holds the booster (UBJSON), feature order, thresholds and baseline
+# statistics, plus a model.tar.gz for SageMaker; the CDK stack deploys LATEST.
+bundle_dir = publish_bundle(
+    model,
+    feature_order=X.columns,
+    baseline_stats=compute_baseline_stats(X_train),
+    metadata={'source': 'scripts/train_model.py', 'test_auc': float(auc), 'train_rows': int(len(X_train_smote))}
+)
+print(f"\nModel bundle saved to '{bundle_dir}'")
@@ -0,0 +1,153 @@
+"""
+Archives expired predictions to the cold tier.
+
+Prediction items carry an `expires_at` TTL attribute, so DynamoDB deletes them
+once they age out of the hot table. The table's stream (OLD_IMAGE) delivers
+those deletions here in batches; each batch is written as compressed,
+date-partitioned columnar files in the training bucket:
+
+    archive/predictions/dt=YYYY-MM-DD/part-<uuid>.parquet    # dt = prediction day
+
+One row per prediction: its metadata, feedback and the 29 features as
+float32 columns (decoded from either storage format). Athena, Glue or
+pandas.read_parquet can read the prefix as a Hive-partitioned table.
+
+Parquet needs pyarrow, which the Lambda gets from the AWS SDK for pandas
+layer. Without it, batches are written as gzip-compressed JSON lines
+(`part-<uuid>.jsonl.gz`) in the same partitions, so no expired item is lost.
+"""
+import base64
+import gzip
+import io
+import json
+import os
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+
+from feature_codec import SCHEMAS, SCHEMA_VERSION, decode_transaction
+from prediction_index import day_bucket
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+TRAINING_DATA_BUCKET_NAME = os.environ.get('TRAINING_DATA_BUCKET_NAME', '')
+ARCHIVE_PREFIX = 'archive/predictions/'
+TTL_PRINCIPAL = 'dynamodb.amazonaws.com'  # userIdentity of deletions made by TTL
+
+FEATURE_COLUMNS = SCHEMAS[SCHEMA_VERSION]
+METADATA_COLUMNS = [
+    ('predictionId', 'string'),
+    ('timestamp', 'string'),
+    ('fraud_score', 'float64'),
+    ('is_fraud', 'int8'),
+    ('scoring_source', 'string'),
+    ('explanation', 'string'),
+    ('feedback_status', 'string'),
+    ('correct_label', 'int8'),
+    ('feedback_timestamp', 'string'),
+    ('expires_at', 'int64'),
+]
+
+s3_client = boto3.client('s3')
+_deserializer = TypeDeserializer()
+
+
+def _decode_binaries(value):
+    """Stream images carry binaries base64-encoded; TypeDeserializer expects bytes."""
+    if isinstance(value, dict):
+        if set(value) == {'B'}:
+            return {'B': base64.b64decode(value['B'])}
+        if set(value) == {'BS'}:
+            return {'BS': [base64.b64decode(b) for b in value['BS']]}
+        return {key: _decode_binaries(inner) for key, inner in value.items()}
+    if isinstance(value, list):
+        return [_decode_binaries(inner) for inner in value]
+    return value
+
+
+def deserialize_image(image):
+    """A stream record's DynamoDB-JSON image as a plain item."""
+    return {key: _deserializer.deserialize(_decode_binaries(value)) for key, value in image.items()}
+
+
+def is_ttl_removal(record):
+    """True for stream records of items deleted by TTL (not by an application)."""
+    identity = record.get('userIdentity') or {}
+    return (record.get('eventName') == 'REMOVE'
+            and identity.get('type') == 'Service'
+            and identity.get('principalId') == TTL_PRINCIPAL)
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def archive_row(item):
+    """Flattens a prediction item into one archive row."""
+    row = {column: _plain(item.get(column)) for column, _ in METADATA_COLUMNS}
+    transaction_data = decode_transaction(item)
+    row.update({column: transaction_data.get(column) for column in FEATURE_COLUMNS})
+    return row
+
+
+def _schema():
+    types = {'string': pa.string(), 'float64': pa.float64(), 'int8': pa.int8(), 'int64': pa.int64()}
+    fields = [pa.field(column, types[column_type]) for column, column_type in METADATA_COLUMNS]
+    fields += [pa.field(column, pa.float32()) for column in FEATURE_COLUMNS]
+    return pa.schema(fields)
+
+
+def encode_partition(rows):
+    """Returns (file extension, bytes) of one partition's rows."""
+    if pa is not None:
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pylist(rows, schema=_schema()), buffer, compression='zstd')
+        return 'parquet', buffer.getvalue()
+    lines = ''.join(json.dumps(row) + '\n' for row in rows)
+    return 'jsonl.gz', gzip.compress(lines.encode('utf-8'))
+
+
+def archive_items(items, bucket, client=s3_client):
+    """Writes items to one file per prediction day and returns the keys written."""
+    partitions = defaultdict(list)
+    for item in items:
+        partitions[day_bucket(item.get('timestamp') or '')].append(archive_row(item))
+
+    keys = []
+    for day, rows in sorted(partitions.items()):
+        extension, body = encode_partition(rows)
+        key = f"{ARCHIVE_PREFIX}dt={day or 'unknown'}/part-{uuid.uuid4()}.{extension}"
+        client.put_object(Bucket=bucket, Key=key, Body=body)
+        keys.append(key)
+    return keys
+
+
+def handler(event, context):
+    """
+    Consumes a batch of predictions-table stream records and archives the items
+    TTL removed. Failures raise, so the batch is retried (and bisected) by the
+    event source mapping rather than dropped.
+    """
+    if not TRAINING_DATA_BUCKET_NAME:
+        raise EnvironmentError("Required environment variables are not set.")
+
+    records = event.get('Records', [])
+    items = [deserialize_image(record['dynamodb']['OldImage'])
+             for record in records if is_ttl_removal(record) and record.get('dynamodb', {}).get('OldImage')]
+    print(f"Archiving {len(items)} expired predictions out of {len(records)} stream records...")
+
+    if not items:
+        return {'archived_count': 0, 'keys': []}
+
+    keys = archive_items(items, TRAINING_DATA_BUCKET_NAME)
+    print(f"Archived {len(items)} predictions to {', '.join(keys)}")
+    return {'archived_count': len(items), 'keys': keys}
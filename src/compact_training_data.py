@@ -0,0 +1,274 @@
+"""
+Compacts the training-data/ prefix of the training bucket.
+
+Every export run adds a small, overlapping CSV under training-data/exports/.
+This job merges those exports with the previous compacted generation, keeps one
+row per predictionId (the one with the latest feedback_timestamp wins), and
+writes size-targeted shards:
+
+    training-data/compacted/<run_id>/part-NNNNN.csv  # predictionId, feedback_timestamp, Class, features (with header)
+    training-data/train/<run_id>/part-NNNNN.csv      # Class, model features (no header, as SageMaker XGBoost expects)
+    training-data/manifest/train.manifest            # SageMaker manifest listing the train shards
+    training-data/manifest/compaction.json           # summary of the run
+
+Exports written before this job existed sit directly under training-data/
+(`verified-data-<timestamp>.csv`: Class and features only, each one a full
+snapshot of the verified items at the time). They are imported once, into the
+first compaction: each of their rows gets a made-up predictionId derived from
+its features, so the overlapping snapshots collapse to one row per transaction
+(the latest snapshot's label winning), and the files are removed with the other
+inputs.
+
+Memory stays bounded: rows are streamed twice (first to pick the winning row
+per predictionId, then to write the winners), so only the id index and one
+pair of shard buffers are held at a time.
+
+Run locally against a directory standing in for the bucket:
+    python src/compact_training_data.py --local-root ./local-bucket
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+from datetime import datetime
+
+import boto3
+
+TRAINING_DATA_BUCKET_NAME = os.environ.get('TRAINING_DATA_BUCKET_NAME', '')
+TARGET_SHARD_MB = float(os.environ.get('COMPACTION_TARGET_SHARD_MB', '64'))
+MODEL_FEATURE_ORDER = os.environ.get('MODEL_FEATURE_ORDER', '')
+
+# --- Bucket Layout ---
+EXPORTS_PREFIX = 'training-data/exports/'
+LEGACY_EXPORTS_PREFIX = 'training-data/verified-data-'  # Root-level exports from before compaction
+LEGACY_ID_PREFIX = 'legacy-'
+COMPACTED_PREFIX = 'training-data/compacted/'
+TRAIN_PREFIX = 'training-data/train/'
+TRAIN_MANIFEST_KEY = 'training-data/manifest/train.manifest'
+COMPACTION_SUMMARY_KEY = 'training-data/manifest/compaction.json'
+
+FEATURE_COLUMNS = [f'V{i}' for i in range(1, 29)] + ['Amount']
+RAW_HEADER = ['predictionId', 'feedback_timestamp', 'Class'] + FEATURE_COLUMNS
+
+s3_client = boto3.client('s3')
+
+
+class S3Storage:
+    """The training bucket."""
+
+    def __init__(self, bucket, client=s3_client):
+        self.bucket = bucket
+        self.client = client
+
+    def list_keys(self, prefix):
+        keys = []
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return sorted(keys)
+
+    def iter_lines(self, key):
+        body = self.client.get_object(Bucket=self.bucket, Key=key)['Body']
+        for line in body.iter_lines():
+            yield line.decode('utf-8')
+
+    def write(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def delete(self, keys):
+        for start in range(0, len(keys), 1000):
+            self.client.delete_objects(Bucket=self.bucket, Delete={
+                'Objects': [{'Key': key} for key in keys[start:start + 1000]], 'Quiet': True
+            })
+
+    def uri(self, key):
+        return f"s3://{self.bucket}/{key}"
+
+
+class LocalStorage:
+    """A local directory standing in for the training bucket (keys are relative paths)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def list_keys(self, prefix):
+        keys = []
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                key = os.path.relpath(os.path.join(directory, filename), self.root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def iter_lines(self, key):
+        with open(self._path(key), newline='') as f:
+            for line in f:
+                yield line.rstrip('\r\n')
+
+    def write(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data.encode('utf-8') if isinstance(data, str) else data)
+
+    def delete(self, keys):
+        for key in keys:
+            os.remove(self._path(key))
+
+    def uri(self, key):
+        return os.path.abspath(self._path(key)) + ('/' if key.endswith('/') else '')
+
+
+def legacy_prediction_id(record):
+    """Made-up predictionId of a legacy export row: a hash of its feature values."""
+    values = ','.join(str(float(record.get(column) or 0)) for column in FEATURE_COLUMNS)
+    return LEGACY_ID_PREFIX + hashlib.sha1(values.encode('utf-8')).hexdigest()
+
+
+def _iter_records(storage, key):
+    """Yields (row_number, record dict) for each data row of a raw-format or legacy export CSV."""
+    legacy = key.startswith(LEGACY_EXPORTS_PREFIX)
+    reader = csv.DictReader(line for line in storage.iter_lines(key) if line)
+    for row_number, record in enumerate(reader):
+        if legacy:
+            record['predictionId'] = legacy_prediction_id(record)
+        yield row_number, record
+
+
+class ShardWriter:
+    """Buffers winning rows and flushes a raw shard and a train shard every `target_bytes`."""
+
+    def __init__(self, storage, run_id, model_features, target_bytes):
+        self.storage = storage
+        self.run_id = run_id
+        self.model_features = model_features
+        self.target_bytes = target_bytes
+        self.train_keys = []
+        self.compacted_keys = []
+        self._start_shard()
+
+    def _start_shard(self):
+        self.raw_buffer = io.StringIO()
+        self.train_buffer = io.StringIO()
+        self.raw_writer = csv.writer(self.raw_buffer)
+        self.train_writer = csv.writer(self.train_buffer)
+        self.raw_writer.writerow(RAW_HEADER)
+        self.rows_in_shard = 0
+
+    def add(self, record):
+        self.raw_writer.writerow([record.get(column, 0) for column in RAW_HEADER])
+        self.train_writer.writerow([record['Class']] + [record.get(column, 0) for column in self.model_features])
+        self.rows_in_shard += 1
+        if self.raw_buffer.tell() >= self.target_bytes:
+            self.flush()
+
+    def flush(self):
+        if not self.rows_in_shard:
+            return
+        shard_name = f"part-{len(self.train_keys):05d}.csv"
+        compacted_key = f"{COMPACTED_PREFIX}{self.run_id}/{shard_name}"
+        train_key = f"{TRAIN_PREFIX}{self.run_id}/{shard_name}"
+        self.storage.write(compacted_key, self.raw_buffer.getvalue())
+        self.storage.write(train_key, self.train_buffer.getvalue())
+        self.compacted_keys.append(compacted_key)
+        self.train_keys.append(train_key)
+        self._start_shard()
+
+
+def compact(storage, model_features=None, target_bytes=int(TARGET_SHARD_MB * 1024 * 1024), run_id=None):
+    """
+    Runs one compaction over `storage` and returns a summary dict. Inputs are the
+    previous compacted generation, then any legacy root-level exports, then the
+    exports, each in key (i.e. time) order, so on equal feedback timestamps the
+    most recent export wins.
+    """
+    model_features = model_features or FEATURE_COLUMNS
+    run_id = run_id or datetime.utcnow().strftime('%Y-%m-%d-%H-%M-%S-%f')
+    previous_shards = storage.list_keys(COMPACTED_PREFIX)
+    previous_train_shards = storage.list_keys(TRAIN_PREFIX)
+    legacy_exports = storage.list_keys(LEGACY_EXPORTS_PREFIX)
+    inputs = previous_shards + legacy_exports + storage.list_keys(EXPORTS_PREFIX)
+
+    if not inputs:
+        return {'run_id': run_id, 'record_count': 0, 'input_count': 0}
+
+    # Pass 1: find the winning row of each predictionId.
+    winners = {}
+    rows_read = 0
+    for input_index, key in enumerate(inputs):
+        for row_number, record in _iter_records(storage, key):
+            rows_read += 1
+            prediction_id = record.get('predictionId')
+            if not prediction_id or record.get('Class') in (None, ''):
+                continue
+            candidate = (record.get('feedback_timestamp') or '', input_index, row_number)
+            if prediction_id not in winners or candidate > winners[prediction_id]:
+                winners[prediction_id] = candidate
+
+    # Pass 2: stream the inputs again and write only the winners.
+    writer = ShardWriter(storage, run_id, model_features, target_bytes)
+    for input_index, key in enumerate(inputs):
+        for row_number, record in _iter_records(storage, key):
+            winner = winners.get(record.get('predictionId'))
+            if winner and winner[1:] == (input_index, row_number):
+                writer.add(record)
+    writer.flush()
+
+    # SageMaker manifest: a common prefix followed by the shard paths relative to it.
+    train_prefix = f"{TRAIN_PREFIX}{run_id}/"
+    manifest = [{'prefix': storage.uri(train_prefix)}] + [key[len(train_prefix):] for key in writer.train_keys]
+    summary = {
+        'run_id': run_id,
+        'record_count': len(winners),
+        'rows_read': rows_read,
+        'rows_dropped': rows_read - len(winners),  # Duplicates and rows without a label
+        'input_count': len(inputs),
+        'legacy_input_count': len(legacy_exports),
+        'model_features': model_features,
+        'train_shards': writer.train_keys,
+        'compacted_shards': writer.compacted_keys,
+        'train_manifest_key': TRAIN_MANIFEST_KEY,
+    }
+    storage.write(TRAIN_MANIFEST_KEY, json.dumps(manifest))
+    storage.write(COMPACTION_SUMMARY_KEY, json.dumps(summary, indent=2))
+
+    # Only now that the new manifest is in place are the inputs safe to remove.
+    written = set(writer.compacted_keys + writer.train_keys)
+    storage.delete([key for key in inputs + previous_train_shards if key not in written])
+    return summary
+
+
+def handler(event, context):
+    """
+    Compacts the training bucket's exports into shards and a training manifest.
+    """
+    print("Starting training data compaction...")
+
+    if not TRAINING_DATA_BUCKET_NAME:
+        raise EnvironmentError("Required environment variables are not set.")
+
+    model_features = MODEL_FEATURE_ORDER.split(',') if MODEL_FEATURE_ORDER else None
+    summary = compact(S3Storage(TRAINING_DATA_BUCKET_NAME), model_features=model_features)
+    print(f"Compaction finished: {json.dumps(summary)}")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Compaction successful.',
+            'record_count': summary['record_count'],
+            'train_manifest_key': TRAIN_MANIFEST_KEY,
+        })
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compact training-data exports into shards and a manifest.")
+    parser.add_argument('--local-root', required=True, help="Directory standing in for the training bucket.")
+    parser.add_argument('--target-shard-mb', type=float, default=TARGET_SHARD_MB)
+    args = parser.parse_args()
+    result = compact(LocalStorage(args.local_root), target_bytes=int(args.target_shard_mb * 1024 * 1024))
+    print(json.dumps(result, indent=2))
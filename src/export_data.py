@@ -3,8 +3,12 @@ import boto3
 import os
 import csv
 import io
-from datetime import datetime
-from decimal import Decimal
+from datetime import datetime, timedelta
+from boto3.dynamodb.conditions import Key
+
+from compact_training_data import EXPORTS_PREFIX, RAW_HEADER
+from feature_codec import decode_transaction
+from prediction_index import MAX_HOT_DAYS, STATUS_FEED_INDEX, status_bucket
 
 # --- Environment Variables ---
 PREDICTIONS_TABLE_NAME = os.environ.get('PREDICTIONS_TABLE_NAME', '')
@@ -14,17 +18,35 @@ TRAINING_DATA_BUCKET_NAME = os.environ.get('TRAINING_DATA_BUCKET_NAME', '')
 dynamodb = boto3.resource('dynamodb')
 s3_client = boto3.client('s3')
 
-class DecimalEncoder(json.JSONEncoder):
-    """Helper class to convert a DynamoDB item to JSON."""
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return str(o)
-        return super(DecimalEncoder, self).default(o)
+def query_verified_items(table, now=None):
+    """
+    Reads every VERIFIED prediction still in the table from the day partitions
+    of the StatusFeedIndex, page by page.
+    """
+    today = (now or datetime.utcnow()).date()
+    items = []
+    for days_ago in range(MAX_HOT_DAYS + 1):
+        day = (today - timedelta(days=days_ago)).isoformat()
+        query_kwargs = {
+            'IndexName': STATUS_FEED_INDEX,
+            'KeyConditionExpression': Key('status_bucket').eq(status_bucket(day, 'VERIFIED')),
+        }
+        while True:
+            response = table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            query_kwargs['ExclusiveStartKey'] = last_key
+    return items
+
 
 def handler(event, context):
     """
-    This function scans the DynamoDB table for verified feedback,
+    This function queries the DynamoDB table for verified feedback,
     formats the data into a CSV file, and uploads it to S3 for retraining.
+    Exports keep predictionId and feedback_timestamp so the compaction job
+    can deduplicate them before they reach the training channel.
     """
     print("Starting data export process...")
 
@@ -33,11 +55,9 @@ def handler(event, context):
 
     table = dynamodb.Table(PREDICTIONS_TABLE_NAME)
     
-    response = table.scan(
-        FilterExpression=boto3.dynamodb.conditions.Attr('feedback_status').eq('VERIFIED')
-    )
-    
-    verified_items = response.get('Items', [])
+    # Reads only the VERIFIED partitions instead of scanning the table; items
+    # that expired before an export are in the archive (see archive_predictions.py).
+    verified_items = query_verified_items(table)
     print(f"Found {len(verified_items)} items with verified feedback.")
 
     if not verified_items:
@@ -51,9 +71,9 @@ def handler(event, context):
         }
 
     # --- Format the data for CSV ---
-    # The first row of the CSV must be the target variable ('Class'),
+    # predictionId and feedback_timestamp, then the target variable ('Class'),
     # followed by all the feature columns.
-    header = ['Class'] + [f'V{i}' for i in range(1, 29)] + ['Amount']
+    header = RAW_HEADER
     
     # in-memory text stream to build the CSV
     output = io.StringIO()
@@ -63,13 +83,11 @@ def handler(event, context):
     for item in verified_items:
         # The 'correct_label' is our new ground truth
         correct_label = item.get('correct_label')
-        transaction_data = item.get('transaction_data', {})
-        
-        # Convert Decimal types back to float/int for processing
-        transaction_data = json.loads(json.dumps(transaction_data, cls=DecimalEncoder))
+        # Map or packed features, decoded to floats
+        transaction_data = decode_transaction(item)
 
         # Create the row in the correct order
-        row = [correct_label] + [transaction_data.get(col, 0) for col in header[1:]]
+        row = [item.get('predictionId'), item.get('feedback_timestamp', ''), correct_label] + [transaction_data.get(col, 0) for col in header[3:]]
         writer.writerow(row)
 
     # Get the CSV data as a string
@@ -77,7 +95,7 @@ def handler(event, context):
     
     # --- Upload to S3 ---
     timestamp = datetime.utcnow().strftime('%Y-%m-%d-%H-%M-%S')
-    s3_key = f"training-data/verified-data-{timestamp}.csv"
+    s3_key = f"{EXPORTS_PREFIX}verified-data-{timestamp}.csv"
     
     try:
         s3_client.put_object(
@@ -0,0 +1,70 @@
+"""
+Compact storage of transaction features on prediction items.
+
+By default a prediction stores its transaction as a DynamoDB map of Decimal
+attributes (`transaction_data`). With the packed format the features are
+stored instead as one binary attribute of little-endian float32 values in
+schema order (`transaction_blob`) plus the schema version
+(`transaction_schema`): 116 bytes for the 29 features instead of a map of
+29 named numbers. Decoded values carry float32 precision (about 7 significant
+digits), which is what the model scores with anyway.
+
+The writer (lambda_function), the exporter (export_data), the feed endpoint and
+the dashboard all read and write transactions through this module.
+"""
+import base64
+import json
+import struct
+from decimal import Decimal
+
+MAP_FORMAT = 'map'
+PACKED_FORMAT = 'packed'
+
+MAP_ATTRIBUTE = 'transaction_data'
+BLOB_ATTRIBUTE = 'transaction_blob'
+SCHEMA_ATTRIBUTE = 'transaction_schema'
+
+# Feature order of each packed schema version. Never reorder a published
+# version; add a new one instead.
+SCHEMAS = {
+    1: [f'V{i}' for i in range(1, 29)] + ['Amount'],
+}
+SCHEMA_VERSION = 1
+
+
+def encode_features(transaction_data, schema_version=SCHEMA_VERSION):
+    """Packs the schema's features of a transaction into float32 bytes (missing features as 0)."""
+    columns = SCHEMAS[schema_version]
+    return struct.pack(f'<{len(columns)}f', *(float(transaction_data.get(col, 0)) for col in columns))
+
+
+def decode_features(blob, schema_version):
+    """Unpacks float32 bytes back into a {feature: float} dict."""
+    columns = SCHEMAS[int(schema_version)]
+    return dict(zip(columns, struct.unpack(f'<{len(columns)}f', blob)))
+
+
+def transaction_attributes(transaction_data, storage_format=MAP_FORMAT):
+    """The item attributes that store a transaction in `storage_format`."""
+    if storage_format == PACKED_FORMAT:
+        return {BLOB_ATTRIBUTE: encode_features(transaction_data), SCHEMA_ATTRIBUTE: SCHEMA_VERSION}
+    return {MAP_ATTRIBUTE: json.loads(json.dumps(transaction_data), parse_float=Decimal)}
+
+
+def _blob_bytes(blob):
+    if isinstance(blob, str):  # Base64, as in JSON API responses
+        return base64.b64decode(blob)
+    return bytes(getattr(blob, 'value', blob))  # boto3 Binary or raw bytes
+
+
+def decode_transaction(item):
+    """
+    Returns the transaction of a prediction item as a {feature: float} dict,
+    whichever format it was stored in.
+    """
+    if item.get(BLOB_ATTRIBUTE) is not None:
+        return decode_features(_blob_bytes(item[BLOB_ATTRIBUTE]), item.get(SCHEMA_ATTRIBUTE, SCHEMA_VERSION))
+    return {
+        key: float(value) if isinstance(value, (Decimal, int, float)) else value
+        for key, value in (item.get(MAP_ATTRIBUTE) or {}).items()
+    }
@@ -0,0 +1,200 @@
+import base64
+import json
+import boto3
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import Binary
+
+from prediction_index import (
+    BAND_FEED_INDEX, STATUS_FEED_INDEX, SCORE_BANDS, FEEDBACK_STATUSES, band_bucket, day_bucket, status_bucket
+)
+
+PREDICTIONS_TABLE_NAME = os.environ.get('PREDICTIONS_TABLE_NAME', '')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_LOOKBACK_DAYS = 7  # Oldest day partition a cursor can reach back to
+INITIAL_LOOKBACK_DAYS = 1  # Day partitions read (besides today) when there is no cursor
+# Items younger than this are held back: writes (write-behind queues, concurrent
+# Lambdas, GSI replication) can land after newer items, and a cursor that has
+# moved past their timestamp would never see them.
+FEED_SETTLE_SECONDS = 5
+
+dynamodb = boto3.resource('dynamodb')
+
+
+class DecimalEncoder(json.JSONEncoder):
+    """Helper class to convert DynamoDB numbers back to JSON numbers and binaries to base64."""
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return int(o) if o == o.to_integral_value() else float(o)
+        if isinstance(o, (Binary, bytes)):
+            # Packed transactions stay packed on the wire; clients decode them with feature_codec.
+            return base64.b64encode(bytes(getattr(o, 'value', o))).decode('ascii')
+        return super(DecimalEncoder, self).default(o)
+
+
+def _parse_list(params, name, allowed):
+    raw = params.get(name) or ''
+    values = [value.strip().upper() for value in raw.split(',') if value.strip()]
+    invalid = [value for value in values if value not in allowed]
+    if invalid:
+        raise ValueError(f"Invalid {name}: {', '.join(invalid)}. Allowed values: {', '.join(allowed)}.")
+    return values
+
+
+def _parse_since(params):
+    """The `since` cursor, which must be an ISO-8601 timestamp like those the feed returns."""
+    since = params.get('since') or None
+    if since:
+        try:
+            datetime.fromisoformat(since)
+        except ValueError:
+            raise ValueError(f"Invalid since: {since}. Expected an ISO-8601 timestamp such as a previous page's cursor.")
+    return since
+
+
+def _days_to_query(since, now):
+    """Day partitions to read, from the cursor's day (or the initial lookback) up to today."""
+    oldest = now - timedelta(days=MAX_LOOKBACK_DAYS)
+    if since:
+        start = max(datetime.strptime(day_bucket(since), '%Y-%m-%d'), oldest)
+    else:
+        start = now - timedelta(days=INITIAL_LOOKBACK_DAYS)
+    days = []
+    day = start.date()
+    while day <= now.date():
+        days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+def _query_partition(table, index_name, key_name, key_value, since, until, limit, newest_first, filter_expression=None):
+    """
+    Reads up to `limit` items of one index partition with timestamps up to `until`,
+    from `since` (inclusive) if given. Returns the items and whether the partition
+    holds more beyond them.
+    """
+    key_condition = Key(key_name).eq(key_value)
+    if since:
+        key_condition = key_condition & Key('timestamp').between(since, until)
+    else:
+        key_condition = key_condition & Key('timestamp').lte(until)
+
+    query_kwargs = {
+        'IndexName': index_name,
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': not newest_first,
+        'Limit': limit,
+    }
+    if filter_expression is not None:
+        query_kwargs['FilterExpression'] = filter_expression
+
+    items = []
+    while True:
+        response = table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if len(items) >= limit or not last_key:
+            break
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+    return items[:limit], len(items) > limit or last_key is not None
+
+
+def fetch_feed(table, since=None, bands=None, statuses=None, limit=DEFAULT_PAGE_SIZE, now=None):
+    """
+    Returns one page of predictions ordered oldest to newest.
+
+    Only items at least FEED_SETTLE_SECONDS old are returned. With a `since`
+    cursor the page holds the oldest `limit` of them from the cursor on; the
+    cursor is inclusive, so items sharing its timestamp are returned again and
+    clients deduplicate by predictionId. Polling with the returned cursor never
+    skips an item that became visible within the settle window. Without a cursor
+    the page holds the newest `limit` items.
+
+    A score band filter, or a feedback status filter on its own, is served by
+    the key conditions of BandFeedIndex or StatusFeedIndex respectively. When
+    both are given, the band partitions are queried and the status is applied
+    as a filter expression on them (there are only two statuses, so at most
+    half of the items read are discarded).
+    """
+    now = now or datetime.utcnow()
+    until = (now - timedelta(seconds=FEED_SETTLE_SECONDS)).isoformat()
+    if since and since > until:
+        return {'items': [], 'cursor': since, 'has_more': False}
+
+    newest_first = not since
+    partitions = []
+
+    # Both indexes are partitioned per day; with bands, a status filter narrows the band partitions.
+    status_filter = Attr('feedback_status').is_in(statuses) if statuses and bands else None
+    for day in _days_to_query(since, now):
+        if bands or not statuses:
+            for band in bands or [name for name, _ in SCORE_BANDS]:
+                partitions.append((BAND_FEED_INDEX, 'band_bucket', band_bucket(day, band), status_filter))
+        else:
+            for status in statuses:
+                partitions.append((STATUS_FEED_INDEX, 'status_bucket', status_bucket(day, status), None))
+
+    items = []
+    has_more = False
+    for index_name, key_name, key_value, filter_expression in partitions:
+        partition_items, partition_has_more = _query_partition(
+            table, index_name, key_name, key_value, since, until, limit, newest_first, filter_expression
+        )
+        items.extend(partition_items)
+        has_more = has_more or partition_has_more
+
+    items.sort(key=lambda item: item['timestamp'], reverse=newest_first)
+    has_more = has_more or len(items) > limit
+    page = sorted(items[:limit], key=lambda item: item['timestamp'])
+
+    return {
+        'items': page,
+        'cursor': page[-1]['timestamp'] if page else since,
+        # Only meaningful when polling: more items newer than the cursor are waiting.
+        'has_more': bool(since) and has_more,
+    }
+
+
+def handler(event, context):
+
+    print("Received feed event", json.dumps(event))
+
+    try:
+        params = event.get('queryStringParameters') or {}
+        since = _parse_since(params)
+        bands = _parse_list(params, 'bands', [name for name, _ in SCORE_BANDS])
+        statuses = _parse_list(params, 'statuses', FEEDBACK_STATUSES)
+        limit = min(max(int(params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+            'body': json.dumps({'error': str(e)})
+        }
+
+    try:
+        if not PREDICTIONS_TABLE_NAME:
+            raise EnvironmentError("PREDICTIONS_TABLE_NAME environment variable is not set.")
+
+        table = dynamodb.Table(PREDICTIONS_TABLE_NAME)
+        page = fetch_feed(table, since=since, bands=bands, statuses=statuses, limit=limit)
+        print(f"Returning {len(page['items'])} feed items (cursor={page['cursor']}, has_more={page['has_more']})")
+
+        return {
+            'statusCode': 200,
+            'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+            'body': json.dumps(page, cls=DecimalEncoder)
+        }
+
+    except Exception as e:
+        print(f"Error reading prediction feed: {e}")
+        return {
+            'statusCode': 500,
+            'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+            'body': json.dumps({'error': 'Internal server error while reading the prediction feed.'})
+        }
@@ -1,8 +1,11 @@
 import json
 import boto3
 import os
+import time
 from datetime import datetime
 
+from prediction_index import day_bucket, status_bucket, verified_expires_at
+
 PREDICTIONS_TABLE_NAME = os.environ.get('PREDICTIONS_TABLE_NAME','')
 
 dynamo_db = boto3.resource('dynamodb')
@@ -23,16 +26,40 @@ def handler(event, context):
             table = dynamo_db.Table(PREDICTIONS_TABLE_NAME)
             print(f"Updating item {prediction_id} with correct_label {correct_label}...")
 
-            response = table.update_item(
+            not_found = {
+                'statusCode': 404,
+                'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+                'body': json.dumps({'error': f'Prediction {prediction_id} not found; it may have expired to the archive.'})
+            }
+
+            # The prediction's day picks its StatusFeedIndex partition.
+            item = table.get_item(
                 Key={'predictionId': prediction_id},
-                UpdateExpression="SET correct_label = :label, feedback_status = :status, feedback_timestamp = :ts",
-                ExpressionAttributeValues={
-                    ':label': int(correct_label), # Ensure it's an integer (0 or 1)
-                    ':status': 'VERIFIED',
-                    ':ts': datetime.utcnow().isoformat()
-                },
-                ReturnValues="UPDATED_NEW" # Returns the new values of the updated attributes
-            )
+                ProjectionExpression="#ts",
+                ExpressionAttributeNames={'#ts': 'timestamp'}
+            ).get('Item')
+            if not item:
+                return not_found
+            day = day_bucket(item['timestamp'])
+
+            try:
+                response = table.update_item(
+                    Key={'predictionId': prediction_id},
+                    # Verified items stay hot for a full TTL period so the next export picks them up.
+                    UpdateExpression="SET correct_label = :label, feedback_status = :status, status_bucket = :bucket, feedback_timestamp = :ts, expires_at = :expires",
+                    # Never recreate a prediction that has already expired to the archive.
+                    ConditionExpression="attribute_exists(predictionId)",
+                    ExpressionAttributeValues={
+                        ':label': int(correct_label), # Ensure it's an integer (0 or 1)
+                        ':status': 'VERIFIED',
+                        ':bucket': status_bucket(day, 'VERIFIED'),
+                        ':ts': datetime.utcnow().isoformat(),
+                        ':expires': verified_expires_at(day, time.time())
+                    },
+                    ReturnValues="UPDATED_NEW" # Returns the new values of the updated attributes
+                )
+            except table.meta.client.exceptions.ConditionalCheckFailedException:
+                return not_found
             
             print("Successfully updated item in DynamoDB. Response:", response)
             
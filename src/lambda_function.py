@@ -1,25 +1,120 @@
 import json
 import boto3
 import os
+import time
 import urllib3
 import uuid
+from botocore.config import Config
 from datetime import datetime
 from decimal import Decimal
 
+from feature_codec import MAP_FORMAT, transaction_attributes
+from prediction_index import PREDICTION_TTL_DAYS, index_attributes
+from resilient_invoker import CircuitBreaker, ResilientInvoker
+
 SAGEMAKER_ENDPOINT_NAME = os.environ.get('SAGEMAKER_ENDPOINT_NAME', '')
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY',"")
 PREDICTIONS_TABLE_NAME = os.environ.get('PREDICTIONS_TABLE_NAME', '')
+TRANSACTION_STORAGE_FORMAT = os.environ.get('TRANSACTION_STORAGE_FORMAT', MAP_FORMAT)  # 'map' or 'packed'
+
+# --- Endpoint Latency Controls ---
+ENDPOINT_LATENCY_BUDGET_MS = int(os.environ.get('ENDPOINT_LATENCY_BUDGET_MS', '1500'))
+ENDPOINT_HEDGING = os.environ.get('ENDPOINT_HEDGING', 'true').lower() == 'true'
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_SECONDS = float(os.environ.get('BREAKER_RESET_SECONDS', '30'))
+
+# --- Fallback Rule Engine (same rules as the dashboard's pre-screening) ---
+RULE_AMOUNT_UPPER = float(os.environ.get('RULE_AMOUNT_UPPER', '25000'))
+RULE_V4_UPPER = float(os.environ.get('RULE_V4_UPPER', 'inf'))
+RULE_V14_LOWER = float(os.environ.get('RULE_V14_LOWER', '-inf'))
 
-sagemaker_runtime = boto3.client('sagemaker-runtime')
+# Column order the deployed model expects (set from the model bundle when features are pruned).
+DEFAULT_FEATURE_COLUMNS = [f'V{i}' for i in range(1, 29)] + ['Amount']
+FEATURE_COLUMNS = os.environ.get('MODEL_FEATURE_ORDER', '').split(',') if os.environ.get('MODEL_FEATURE_ORDER') else DEFAULT_FEATURE_COLUMNS
+FRAUD_THRESHOLD = float(os.environ.get('MODEL_FRAUD_THRESHOLD', '0.5'))  # The model bundle's thresholds['fraud']
+
+# --- Similar-Case Evidence (optional; the index needs numpy, e.g. from a layer) ---
+SIMILAR_CASES_INDEX_DIR = os.environ.get('SIMILAR_CASES_INDEX_DIR', '')
+SIMILAR_CASES_K = int(os.environ.get('SIMILAR_CASES_K', '5'))
+
+# No botocore retries and a read timeout matching the budget: the invoker's hedge
+# or immediate retry replaces them, and abandoned attempts must not outlive the
+# request by much.
+sagemaker_runtime = boto3.client('sagemaker-runtime', config=Config(
+    connect_timeout=1,
+    read_timeout=max(ENDPOINT_LATENCY_BUDGET_MS / 1000, 1),
+    retries={'max_attempts': 1, 'mode': 'standard'}
+))
 dynamodb = boto3.resource('dynamodb')
 http = urllib3.PoolManager()
+similar_case_index = None  # Opened on first use
 
 
-def get_gemini_explaination(transaction_data, fraud_score):
-    
-    if not GEMINI_API_KEY:
-        return 'Gemini api key not configured, cannot generate explainations'
-    
+def invoke_sagemaker(transaction_data):
+    """Scores one transaction on the SageMaker endpoint."""
+    csv_payload = ','.join(str(transaction_data[col]) for col in FEATURE_COLUMNS)
+    response = sagemaker_runtime.invoke_endpoint(
+        EndpointName = SAGEMAKER_ENDPOINT_NAME,
+        ContentType = 'text/csv',
+        Body = csv_payload
+    )
+    return float(response['Body'].read().decode('utf-8'))
+
+
+def run_rule_engine(transaction_data):
+    """Returns the reason a transaction breaks a business rule, or None."""
+    amount = transaction_data.get('Amount', 0)
+    v4 = transaction_data.get('V4', 0)
+    v14 = transaction_data.get('V14', 0)
+    if amount > RULE_AMOUNT_UPPER: return f"Transaction amount of ${amount:,.2f} exceeds the business limit."
+    if v4 > RULE_V4_UPPER: return f"Feature V4 value of {v4:.2f} is an extreme outlier."
+    if v14 < RULE_V14_LOWER: return f"Feature V14 value of {v14:.2f} is an extreme outlier."
+    return None
+
+
+def rule_engine_score(transaction_data):
+    """Fallback scorer used while the endpoint is slow or unavailable."""
+    return 1.0 if run_rule_engine(transaction_data) else 0.0
+
+
+# Module-level so latency history and breaker state persist across warm invocations.
+endpoint_invoker = ResilientInvoker(
+    invoke_sagemaker,
+    rule_engine_score,
+    latency_budget_ms=ENDPOINT_LATENCY_BUDGET_MS,
+    hedging=ENDPOINT_HEDGING,
+    breaker=CircuitBreaker(failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout_s=BREAKER_RESET_SECONDS)
+)
+
+
+def fallback_explanation(transaction_data):
+    """Explanation returned when the rule engine scored the transaction instead of the model."""
+    return run_rule_engine(transaction_data) or 'Scored by the fallback rule engine because the model endpoint is unavailable.'
+
+
+def find_similar_cases(transaction_data, k=SIMILAR_CASES_K):
+    """
+    The `k` most similar past verified cases of a transaction, or an empty list
+    when no similar-case index is configured or it cannot be searched.
+    """
+    global similar_case_index
+    if not SIMILAR_CASES_INDEX_DIR:
+        return []
+    try:
+        if similar_case_index is None:
+            from similar_cases import SimilarCaseIndex
+            similar_case_index = SimilarCaseIndex(SIMILAR_CASES_INDEX_DIR)
+        return similar_case_index.search_transaction(transaction_data, k)
+    except Exception as e:
+        print(f"Error searching similar cases: {e}")
+        return []
+
+
+def build_gemini_request(transaction_data, fraud_score, similar_cases=None):
+    """
+    Returns the Gemini URL and request payload for explaining a flagged transaction,
+    grounded in the labels of its most similar past cases when they are given.
+    """
     prompt_features = {
         'Amount': transaction_data.get('Amount'),
         "V4": transaction_data.get("V4"),
@@ -37,6 +132,13 @@ def get_gemini_explaination(transaction_data, fraud_score):
     {json.dumps(prompt_features, indent=2)}
     """
 
+    if similar_cases:
+        frauds = sum(case['label'] for case in similar_cases)
+        prompt += f"""
+    Evidence from past cases: of the {len(similar_cases)} most similar transactions verified by analysts,
+    {frauds} were confirmed fraud and {len(similar_cases) - frauds} were legitimate. Mention this evidence in your explanation.
+    """
+
     gemini_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
 
     payload = {
@@ -47,6 +149,21 @@ def get_gemini_explaination(transaction_data, fraud_score):
         }]
     }
 
+    return gemini_url, payload
+
+
+def parse_gemini_response(response_data):
+    """Extracts the explanation text from a Gemini response body."""
+    return response_data['candidates'][0]['content']['parts'][0]['text'].strip()
+
+
+def get_gemini_explaination(transaction_data, fraud_score):
+    
+    if not GEMINI_API_KEY:
+        return 'Gemini api key not configured, cannot generate explainations'
+
+    gemini_url, payload = build_gemini_request(transaction_data, fraud_score, find_similar_cases(transaction_data))
+
     headers = {"Content-Type": "application/json"}
 
     try:
@@ -60,15 +177,31 @@ def get_gemini_explaination(transaction_data, fraud_score):
 
         response_data = json.loads(response.data.decode('utf-8'))
 
-        explaination = response_data['candidates'][0]['content']['parts'][0]['text']
-
-        return explaination.strip()
+        return parse_gemini_response(response_data)
     
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
         return "Could not generate an explanation due to an API error."
 
 
+def build_prediction_item(prediction_id, transaction_data, fraud_score, is_fraud, explanation, scoring_source):
+    """The DynamoDB item recorded for every prediction."""
+    timestamp = datetime.utcnow().isoformat()
+    item = {
+        'predictionId': prediction_id,
+        'timestamp': timestamp,
+        'is_fraud': int(is_fraud),
+        'fraud_score': Decimal(str(fraud_score)),
+        'explanation': explanation,
+        'scoring_source': scoring_source,
+        'feedback_status': 'PENDING', # Initial status
+        'correct_label': None, # Placeholder for human feedback
+        'expires_at': int(time.time()) + PREDICTION_TTL_DAYS * 86400 # TTL (epoch seconds); expired items are archived to S3
+    }
+    item.update(transaction_attributes(transaction_data, TRANSACTION_STORAGE_FORMAT)) # The transaction, as a map or packed features
+    item.update(index_attributes(timestamp, fraud_score)) # Keys for the live feed indexes
+    return item
+
 
 def handler(event, context):
 
@@ -80,26 +213,20 @@ def handler(event, context):
 
         transaction_data = json.loads(body)
 
-        feature_columns = [f'V{i}' for i in range(1, 29)] + ['Amount']
-
-        payload_values = [transaction_data[col] for col in feature_columns]
-
-        csv_payload = ','.join(map(str, payload_values))
-
-        response = sagemaker_runtime.invoke_endpoint(
-            EndpointName = SAGEMAKER_ENDPOINT_NAME,
-            ContentType = 'text/csv',
-            Body = csv_payload
-        )
+        missing_columns = [col for col in FEATURE_COLUMNS if col not in transaction_data]
+        if missing_columns:
+            raise KeyError(f"Missing features: {', '.join(missing_columns)}")
 
-        prediction = response['Body'].read().decode('utf-8')
+        fraud_score, scoring_source = endpoint_invoker.invoke(transaction_data)
+        print('Endpoint invoker stats', json.dumps(endpoint_invoker.snapshot()))
 
-        fraud_score = float(prediction)
-        is_fraud = float(prediction) > 0.5
+        is_fraud = fraud_score > FRAUD_THRESHOLD
         explanation = 'N/A'
 
         #encriching response with explainations
-        if is_fraud:
+        if scoring_source == 'fallback':
+            explanation = fallback_explanation(transaction_data)
+        elif is_fraud:
             explanation = get_gemini_explaination(transaction_data, fraud_score)
 
         # Store prediction in DynamoDB
@@ -107,18 +234,7 @@ def handler(event, context):
         if PREDICTIONS_TABLE_NAME:
             try:
                 table = dynamodb.Table(PREDICTIONS_TABLE_NAME)
-                transaction_data_decimal = json.loads(json.dumps(transaction_data), parse_float=Decimal)
-                table.put_item(
-                    Item={
-                        'predictionId': prediction_id,
-                        'timestamp': datetime.utcnow().isoformat(),
-                        'is_fraud': int(is_fraud),
-                        'fraud_score': Decimal(str(fraud_score)),
-                        'transaction_data': transaction_data_decimal, # Store the full transaction
-                        'feedback_status': 'PENDING', # Initial status
-                        'correct_label': None # Placeholder for human feedback
-                    }
-                )
+                table.put_item(Item=build_prediction_item(prediction_id, transaction_data, fraud_score, is_fraud, explanation, scoring_source))
             except Exception as e:
                 print(f"Error storing prediction in DynamoDB: {e}")
 
@@ -131,7 +247,8 @@ def handler(event, context):
                 'prediction_id': prediction_id,
                 'is_fraud': is_fraud,
                 'fraud_score': fraud_score,
-                'explanation': explanation
+                'explanation': explanation,
+                'scoring_source': scoring_source
             })
         }
     
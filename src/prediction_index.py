@@ -0,0 +1,71 @@
+"""
+Key helpers for the time-ordered indexes on the predictions table.
+
+Every prediction is written with a `day_bucket` (YYYY-MM-DD) and a
+`score_band`, so the dashboard feed can query a single day/band partition
+ordered by `timestamp` instead of scanning the whole table. The feedback
+status index is partitioned per day the same way (`status_bucket`), so new
+predictions do not all land in one PENDING partition.
+
+Predictions expire from the table after PREDICTION_TTL_DAYS (see
+archive_predictions.py); feedback keeps an item hot for another TTL period, but
+never past MAX_HOT_DAYS after its prediction day, which bounds the day
+partitions a reader of the VERIFIED status must query.
+"""
+import os
+from datetime import datetime, timezone
+
+PREDICTION_TTL_DAYS = int(os.environ.get('PREDICTION_TTL_DAYS', '90'))  # Days in the hot table before TTL archives an item
+MAX_HOT_DAYS = 2 * PREDICTION_TTL_DAYS
+
+# --- Index Names (must match infra/infra/infra_stack.py) ---
+BAND_FEED_INDEX = 'BandFeedIndex'      # PK: band_bucket,     SK: timestamp
+STATUS_FEED_INDEX = 'StatusFeedIndex'  # PK: status_bucket,   SK: timestamp
+
+# Lower bounds of each score band, checked from the highest band down.
+SCORE_BANDS = [('HIGH', 0.5), ('MEDIUM', 0.2), ('LOW', 0.0)]
+FEEDBACK_STATUSES = ['PENDING', 'VERIFIED']
+
+
+def day_bucket(timestamp):
+    """Returns the day partition (YYYY-MM-DD) of an ISO-8601 timestamp."""
+    return timestamp[:10]
+
+
+def score_band(fraud_score):
+    """Maps a fraud score to its band name."""
+    for band, lower_bound in SCORE_BANDS:
+        if fraud_score >= lower_bound:
+            return band
+    return SCORE_BANDS[-1][0]
+
+
+def band_bucket(day, band):
+    """Partition key value of the BandFeedIndex for one day and band."""
+    return f"{day}#{band}"
+
+
+def status_bucket(day, feedback_status):
+    """Partition key value of the StatusFeedIndex for one day and feedback status."""
+    return f"{day}#{feedback_status}"
+
+
+def verified_expires_at(day, now):
+    """
+    TTL (epoch seconds) of an item verified at `now` (epoch seconds) whose status
+    bucket is `day`: another TTL period, capped at MAX_HOT_DAYS after that day.
+    """
+    day_start = int(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+    return min(int(now) + PREDICTION_TTL_DAYS * 86400, day_start + MAX_HOT_DAYS * 86400)
+
+
+def index_attributes(timestamp, fraud_score, feedback_status='PENDING'):
+    """The extra attributes a prediction item needs to appear in the feed indexes."""
+    day = day_bucket(timestamp)
+    band = score_band(fraud_score)
+    return {
+        'day_bucket': day,
+        'score_band': band,
+        'band_bucket': band_bucket(day, band),
+        'status_bucket': status_bucket(day, feedback_status),
+    }
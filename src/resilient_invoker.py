@@ -0,0 +1,189 @@
+"""
+Tail-latency control for model endpoint calls.
+
+`ResilientInvoker` wraps a blocking scoring call (e.g. SageMaker invoke_endpoint)
+with a latency budget, an optional hedged second request once the first one is
+slower than the recent p95, an immediate retry when the first request fails
+early, and a circuit breaker that routes traffic to a fallback scorer while the
+endpoint is degraded. Every path taken is counted.
+
+The scoring call and the fallback are plain callables, so the invoker can be
+exercised against a local fake endpoint that injects delays or errors.
+"""
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open, calls are
+    rejected until `reset_timeout_s` has passed; then a single trial call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+    CLOSED = 'CLOSED'
+    OPEN = 'OPEN'
+    HALF_OPEN = 'HALF_OPEN'
+
+    def __init__(self, failure_threshold=5, reset_timeout_s=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout_s:
+                self.state = self.HALF_OPEN
+                return True
+            return False  # Open, or a half-open trial is already in flight
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies (ms)."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def add(self, latency_ms):
+        with self._lock:
+            self.samples.append(latency_ms)
+
+    def percentile(self, pct):
+        """The `pct` percentile of the window, or None until enough samples are in."""
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ResilientInvoker:
+    """
+    Calls `invoke_fn(payload)` within `latency_budget_ms`, hedging, retrying and
+    falling back to `fallback_fn(payload)` as needed. At most one extra attempt is
+    made per call: a hedge while the first attempt is slow, or a retry as soon as
+    it fails. `invoke` returns `(result, source)` where source is 'endpoint',
+    'endpoint_hedged', 'endpoint_retried' or 'fallback'.
+    """
+
+    def __init__(self, invoke_fn, fallback_fn, latency_budget_ms=1500, hedging=True, hedge_percentile=95,
+                 min_hedge_delay_ms=20, breaker=None, latency_tracker=None, max_workers=8):
+        self.invoke_fn = invoke_fn
+        self.fallback_fn = fallback_fn
+        self.latency_budget_ms = latency_budget_ms
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay_ms = min_hedge_delay_ms
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = latency_tracker or LatencyTracker()
+        self.counters = Counter()
+        self._counters_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='endpoint-invoker')
+
+    def _count(self, name):
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def _timed_call(self, payload):
+        start = time.perf_counter()
+        result = self.invoke_fn(payload)
+        self.latency.add((time.perf_counter() - start) * 1000)
+        return result
+
+    def _hedge_delay_ms(self):
+        """Delay before sending a hedged request: the recent p95, once it is known."""
+        if not self.hedging:
+            return None
+        p95 = self.latency.percentile(self.hedge_percentile)
+        if p95 is None:
+            return None
+        return max(p95, self.min_hedge_delay_ms)
+
+    def _fallback(self, payload, reason):
+        self._count('fallback')
+        self._count(f'fallback_{reason}')
+        return self.fallback_fn(payload), 'fallback'
+
+    def invoke(self, payload):
+        self._count('calls')
+        if not self.breaker.allow_request():
+            return self._fallback(payload, 'breaker_open')
+
+        deadline = time.perf_counter() + self.latency_budget_ms / 1000
+        primary = self._executor.submit(self._timed_call, payload)
+        in_flight = {primary}
+        second, second_source = None, None
+
+        hedge_at = None
+        hedge_delay_ms = self._hedge_delay_ms()
+        if hedge_delay_ms is not None and hedge_delay_ms < self.latency_budget_ms:
+            hedge_at = time.perf_counter() + hedge_delay_ms / 1000
+
+        while in_flight:
+            now = time.perf_counter()
+            remaining = deadline - now
+            if remaining <= 0:
+                break
+            timeout = remaining
+            if second is None and hedge_at is not None:
+                timeout = min(timeout, max(hedge_at - now, 0))
+            done, in_flight = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.breaker.record_success()
+                    if future is second:
+                        self._count('hedge_wins' if second_source == 'endpoint_hedged' else 'retry_wins')
+                        return future.result(), second_source
+                    self._count('endpoint_success')
+                    return future.result(), 'endpoint'
+                self._count('errors')
+                print(f"Endpoint call failed: {future.exception()}")
+
+            if second is None and time.perf_counter() < deadline:
+                if not in_flight:
+                    # The first attempt failed early (e.g. throttling or a 5xx): retry at once.
+                    self._count('retries')
+                    second, second_source = self._executor.submit(self._timed_call, payload), 'endpoint_retried'
+                elif hedge_at is not None and time.perf_counter() >= hedge_at:
+                    self._count('hedged')
+                    second, second_source = self._executor.submit(self._timed_call, payload), 'endpoint_hedged'
+                if second is not None:
+                    in_flight.add(second)
+
+        # Every attempt failed or the budget ran out. Attempts still running are
+        # abandoned; the client's own read timeout bounds how long they linger.
+        self.breaker.record_failure()
+        if in_flight:
+            self._count('timeouts')
+            return self._fallback(payload, 'timeout')
+        return self._fallback(payload, 'error')
+
+    def snapshot(self):
+        """Counters plus breaker state and current latency percentiles, for logging."""
+        with self._counters_lock:
+            stats = dict(self.counters)
+        stats['breaker_state'] = self.breaker.state
+        stats['p50_ms'] = self.latency.percentile(50)
+        stats['p95_ms'] = self.latency.percentile(95)
+        return stats
@@ -0,0 +1,253 @@
+"""
+Nearest-neighbour index over past verified transactions.
+
+Vectors are the feature_codec schema features, standardized with the mean and
+standard deviation of the data the index was built from, stored as float32.
+The index is a directory of flat files that are memory-mapped on open, so
+loading it costs no parsing:
+
+    meta.json      # schema version, features, mean, std, count
+    vectors.f32    # count x dim float32, row-major
+    sq_norms.f32   # squared norm of each vector
+    labels.u8      # 0 = legitimate, 1 = fraud
+    ids.txt        # predictionId (or source row) of each vector
+
+Search is an exact, vectorized brute-force scan (|q|^2 - 2 q.v + |v|^2 over
+chunks of rows). New feedback is appended in place with `add`.
+
+Build from creditcard.csv or an export_data CSV:
+    python src/similar_cases.py build --csv data/creditcard.csv --out similar_index
+    python src/similar_cases.py add --csv verified-data-<timestamp>.csv --index similar_index
+"""
+import argparse
+import csv
+import json
+import os
+import threading
+
+import numpy as np
+
+from feature_codec import SCHEMAS, SCHEMA_VERSION
+
+META_FILENAME = 'meta.json'
+VECTORS_FILENAME = 'vectors.f32'
+NORMS_FILENAME = 'sq_norms.f32'
+LABELS_FILENAME = 'labels.u8'
+IDS_FILENAME = 'ids.txt'
+
+SEARCH_CHUNK_ROWS = 262144  # Bounds the temporary distance matrix per query batch
+EXACT_MATCH_SLACK = 5  # Extra candidates fetched per query to make up for excluded exact matches
+READ_CHUNK_ROWS = 50000
+
+
+class SimilarCaseIndex:
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(self._path(META_FILENAME)) as f:
+            self.meta = json.load(f)
+        self.features = self.meta['features']
+        self.mean = np.asarray(self.meta['mean'], dtype=np.float32)
+        self.std = np.asarray(self.meta['std'], dtype=np.float32)
+        with open(self._path(IDS_FILENAME)) as f:
+            self.ids = f.read().splitlines()
+        self.positions = {case_id: position for position, case_id in enumerate(self.ids)}
+        # One index may be shared by threads (e.g. the dashboard's cached resource); adds
+        # append to four files and must not interleave, or vectors, labels and ids misalign.
+        self._add_lock = threading.Lock()
+        self._map_files()
+
+    def _path(self, filename):
+        return os.path.join(self.index_dir, filename)
+
+    def _map_files(self):
+        count, dim = self.meta['count'], len(self.features)
+        if count == 0:
+            self.vectors = np.empty((0, dim), dtype=np.float32)
+            self.sq_norms = np.empty(0, dtype=np.float32)
+            self.labels = np.empty(0, dtype=np.uint8)
+            return
+        self.vectors = np.memmap(self._path(VECTORS_FILENAME), dtype=np.float32, mode='r', shape=(count, dim))
+        self.sq_norms = np.memmap(self._path(NORMS_FILENAME), dtype=np.float32, mode='r', shape=(count,))
+        self.labels = np.memmap(self._path(LABELS_FILENAME), dtype=np.uint8, mode='r', shape=(count,))
+
+    def __len__(self):
+        return self.meta['count']
+
+    def standardize(self, rows):
+        return ((np.asarray(rows, dtype=np.float32) - self.mean) / self.std).astype(np.float32)
+
+    def to_matrix(self, transactions):
+        """Feature matrix of a list of {feature: value} transactions."""
+        return np.array([[float(t.get(col, 0)) for col in self.features] for t in transactions], dtype=np.float32)
+
+    def search(self, rows, k=5, exclude_ids=(), exclude_exact=False):
+        """
+        The `k` nearest past cases of each row of `rows` (raw, unstandardized
+        features in index order) as lists of {'id', 'label', 'distance'}.
+
+        Cases in `exclude_ids` are left out: a transaction that is itself in the
+        index would otherwise be its own nearest case and give its label away.
+        `exclude_exact` also leaves out every case identical to the query, for
+        queries that may be indexed under an unknown id. It is off by default,
+        since for a new transaction an identical past case (e.g. a replay) is
+        the strongest evidence there is.
+        """
+        queries = self.standardize(np.atleast_2d(rows))
+        exclude_ids = set(exclude_ids)
+        fetch_k = min(k + len(exclude_ids) + (EXACT_MATCH_SLACK if exclude_exact else 0), len(self))
+        if k == 0 or fetch_k == 0:
+            return [[] for _ in range(len(queries))]
+
+        query_norms = np.einsum('ij,ij->i', queries, queries)[:, None]
+        best_distances = np.full((len(queries), 0), np.inf, dtype=np.float32)
+        best_positions = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self), SEARCH_CHUNK_ROWS):
+            chunk = self.vectors[start:start + SEARCH_CHUNK_ROWS]
+            distances = query_norms - 2 * queries @ chunk.T + self.sq_norms[start:start + SEARCH_CHUNK_ROWS]
+            chunk_k = min(fetch_k, len(chunk))
+            top = np.argpartition(distances, chunk_k - 1, axis=1)[:, :chunk_k]
+            best_distances = np.hstack([best_distances, np.take_along_axis(distances, top, axis=1)])
+            best_positions = np.hstack([best_positions, top + start])
+
+        order = np.argsort(best_distances, axis=1)[:, :fetch_k]
+        results = []
+        for query, query_positions, query_order in zip(queries, best_positions, order):
+            # Exact distances of the few candidates: the expanded form above loses
+            # precision, and identical cases must come out as exactly 0.
+            candidates = np.sort(query_positions[query_order])
+            exact = np.sqrt(np.sum((self.vectors[candidates] - query) ** 2, axis=1))
+            cases = []
+            for i in np.argsort(exact, kind='stable'):
+                case_id = self.ids[candidates[i]]
+                if case_id in exclude_ids or (exclude_exact and exact[i] == 0):
+                    continue
+                cases.append({'id': case_id, 'label': int(self.labels[candidates[i]]), 'distance': float(exact[i])})
+                if len(cases) == k:
+                    break
+            results.append(cases)
+        return results
+
+    def search_transaction(self, transaction_data, k=5, exclude_ids=(), exclude_exact=False):
+        return self.search(self.to_matrix([transaction_data]), k, exclude_ids, exclude_exact)[0]
+
+    def add(self, rows, labels, ids):
+        """
+        Appends new labelled cases. A case whose id is already indexed only has
+        its label updated (e.g. an analyst corrected earlier feedback).
+        """
+        with self._add_lock:
+            return self._add(rows, labels, ids)
+
+    def _add(self, rows, labels, ids):
+        new_rows, new_labels, new_ids, relabels = [], [], [], {}
+        for row, label, case_id in zip(np.atleast_2d(rows), labels, ids):
+            if case_id in self.positions:
+                relabels[self.positions[case_id]] = label
+            elif case_id not in new_ids:
+                new_rows.append(row)
+                new_labels.append(label)
+                new_ids.append(case_id)
+
+        if relabels:
+            writable_labels = np.memmap(self._path(LABELS_FILENAME), dtype=np.uint8, mode='r+', shape=(len(self),))
+            writable_labels[list(relabels)] = list(relabels.values())
+            writable_labels.flush()
+            del writable_labels
+        if not new_ids:
+            return 0
+
+        vectors = self.standardize(new_rows)
+        _append(self.index_dir, vectors, np.asarray(new_labels, dtype=np.uint8), new_ids)
+        for case_id in new_ids:
+            self.positions[case_id] = len(self.ids)
+            self.ids.append(case_id)
+        self.meta['count'] += len(new_ids)
+        _write_meta(self.index_dir, self.meta)
+        self._map_files()
+        return len(new_ids)
+
+
+def _write_meta(index_dir, meta):
+    tmp_path = os.path.join(index_dir, f".{META_FILENAME}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(index_dir, META_FILENAME))
+
+
+def _append(index_dir, vectors, labels, ids):
+    with open(os.path.join(index_dir, VECTORS_FILENAME), 'ab') as f:
+        f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+    with open(os.path.join(index_dir, NORMS_FILENAME), 'ab') as f:
+        f.write(np.einsum('ij,ij->i', vectors, vectors).astype(np.float32).tobytes())
+    with open(os.path.join(index_dir, LABELS_FILENAME), 'ab') as f:
+        f.write(labels.tobytes())
+    with open(os.path.join(index_dir, IDS_FILENAME), 'a') as f:
+        f.writelines(f"{case_id}\n" for case_id in ids)
+
+
+def build_index(index_dir, rows, labels, ids, features=None):
+    """Creates an index from raw feature rows; the standardization is fitted on them."""
+    features = features or SCHEMAS[SCHEMA_VERSION]
+    rows = np.asarray(rows, dtype=np.float32)
+    mean = rows.mean(axis=0)
+    std = rows.std(axis=0)
+    std[std == 0] = 1.0
+
+    os.makedirs(index_dir, exist_ok=True)
+    for filename in (VECTORS_FILENAME, NORMS_FILENAME, LABELS_FILENAME, IDS_FILENAME):
+        open(os.path.join(index_dir, filename), 'wb').close()
+    _append(index_dir, ((rows - mean) / std).astype(np.float32), np.asarray(labels, dtype=np.uint8), list(ids))
+    _write_meta(index_dir, {
+        'schema_version': SCHEMA_VERSION,
+        'features': features,
+        'mean': mean.tolist(),
+        'std': std.tolist(),
+        'count': len(rows),
+    })
+    return SimilarCaseIndex(index_dir)
+
+
+def read_labelled_csv(csv_path, features=None):
+    """
+    Reads feature rows, labels and ids from creditcard.csv or an export_data CSV
+    (ids are the predictionId column when present, else the source row number).
+    """
+    features = features or SCHEMAS[SCHEMA_VERSION]
+    row_chunks, labels, ids = [], [], []
+    with open(csv_path, newline='') as f:
+        reader = csv.DictReader(f)
+        chunk = []
+        for row_number, record in enumerate(reader):
+            if record.get('Class') in (None, ''):
+                continue
+            chunk.append([float(record.get(col) or 0) for col in features])
+            labels.append(int(float(record['Class'])))
+            ids.append(record.get('predictionId') or f"{os.path.basename(csv_path)}:{row_number}")
+            if len(chunk) >= READ_CHUNK_ROWS:
+                row_chunks.append(np.asarray(chunk, dtype=np.float32))
+                chunk = []
+        if chunk:
+            row_chunks.append(np.asarray(chunk, dtype=np.float32))
+    rows = np.vstack(row_chunks) if row_chunks else np.empty((0, len(features)), dtype=np.float32)
+    return rows, labels, ids
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or extend the similar-case index.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help="Build a new index from a labelled CSV.")
+    build_parser.add_argument('--csv', required=True)
+    build_parser.add_argument('--out', required=True)
+    add_parser = subparsers.add_parser('add', help="Add the cases of a labelled CSV to an index.")
+    add_parser.add_argument('--csv', required=True)
+    add_parser.add_argument('--index', required=True)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = build_index(args.out, *read_labelled_csv(args.csv))
+        print(f"Built index of {len(index)} cases in '{args.out}'")
+    else:
+        index = SimilarCaseIndex(args.index)
+        added = index.add(*read_labelled_csv(args.csv, index.features))
+        print(f"Added {added} cases; index now holds {len(index)}")
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The Lambda sources and scripts use flat imports, as they do when deployed/run.
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+# Lambda modules create their boto3 clients at import time, which needs a region (no calls are made).
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from backfill_prediction_index import backfill_attributes, backfill_item
+from export_data import query_verified_items
+from prediction_index import MAX_HOT_DAYS, PREDICTION_TTL_DAYS
+
+NOW = datetime(2026, 6, 1, 12, tzinfo=timezone.utc).timestamp()
+
+
+class ConditionalCheckFailedException(Exception):
+    pass
+
+
+class FakeTable:
+    """Records update_item calls; fails the condition for ids in `changed_ids`."""
+
+    def __init__(self, changed_ids=()):
+        self.updates = []
+        self.changed_ids = set(changed_ids)
+        self.meta = type('Meta', (), {'client': type('Client', (), {'exceptions': type('Exceptions', (), {
+            'ConditionalCheckFailedException': ConditionalCheckFailedException})})})
+
+    def update_item(self, **kwargs):
+        if kwargs['Key']['predictionId'] in self.changed_ids:
+            raise ConditionalCheckFailedException()
+        self.updates.append(kwargs)
+
+
+def updated_attributes(update):
+    names, values = update['ExpressionAttributeNames'], update['ExpressionAttributeValues']
+    return {name: values[placeholder.replace('#', ':')] for placeholder, name in names.items()}
+
+
+def test_legacy_item_gets_the_feed_index_attributes():
+    item = {'predictionId': 'p1', 'timestamp': '2025-03-04T05:06:07', 'fraud_score': Decimal('0.7'),
+            'feedback_status': 'VERIFIED', 'expires_at': 1}
+
+    assert backfill_attributes(item) == {
+        'day_bucket': '2025-03-04',
+        'score_band': 'HIGH',
+        'band_bucket': '2025-03-04#HIGH',
+        'status_bucket': '2025-03-04#VERIFIED',
+    }
+
+
+def test_update_is_conditional_on_the_scanned_status():
+    table = FakeTable()
+    item = {'predictionId': 'p1', 'timestamp': '2025-03-04T05:06:07', 'fraud_score': Decimal('0.01'), 'feedback_status': 'PENDING'}
+
+    assert backfill_item(table, item) == 'updated'
+
+    update = table.updates[0]
+    assert updated_attributes(update)['status_bucket'] == '2025-03-04#PENDING'
+    assert update['ExpressionAttributeValues'][':status'] == 'PENDING'
+    assert 'attribute_exists(predictionId)' in update['ConditionExpression']
+
+
+def test_items_that_changed_or_cannot_be_indexed_are_not_written():
+    table = FakeTable(changed_ids={'p1'})
+
+    assert backfill_item(table, {'predictionId': 'p1', 'timestamp': '2025-03-04T05:06:07', 'fraud_score': Decimal('0.3')}) == 'changed'
+    assert backfill_item(table, {'predictionId': 'p2', 'fraud_score': Decimal('0.3')}) == 'skipped'
+    assert backfill_item(table, {'predictionId': 'p3', 'timestamp': '2025-03-04T05:06:07'}, dry_run=True) == 'updated'
+    assert table.updates == []
+
+
+def test_pending_item_expires_a_ttl_period_after_its_prediction():
+    item = {'predictionId': 'p1', 'timestamp': '2026-05-01T00:00:00', 'fraud_score': Decimal('0.01'), 'feedback_status': 'PENDING'}
+
+    attributes = backfill_attributes(item, now=NOW)
+
+    assert attributes['expires_at'] == datetime(2026, 5, 1, tzinfo=timezone.utc).timestamp() + PREDICTION_TTL_DAYS * 86400
+
+
+def test_old_verified_item_stays_in_a_partition_the_export_reads_until_it_expires():
+    item = {'predictionId': 'p1', 'timestamp': '2024-01-01T00:00:00', 'fraud_score': Decimal('0.9'), 'feedback_status': 'VERIFIED'}
+
+    attributes = backfill_attributes(item, now=NOW)
+
+    assert attributes['expires_at'] > NOW
+    # An export run just before the item expires still reads its status partition.
+    last_export = datetime.fromtimestamp(attributes['expires_at'] - 1, timezone.utc).replace(tzinfo=None)
+    table = QueryRecorder()
+    query_verified_items(table, now=last_export)
+    assert attributes['status_bucket'] in table.partitions
+    assert len(table.partitions) == MAX_HOT_DAYS + 1
+
+
+class QueryRecorder:
+    """Records the StatusFeedIndex partitions queried; every partition is empty."""
+
+    def __init__(self):
+        self.partitions = []
+
+    def query(self, **kwargs):
+        self.partitions.append(kwargs['KeyConditionExpression'].get_expression()['values'][1])
+        return {'Items': []}
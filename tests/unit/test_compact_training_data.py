@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+
+from compact_training_data import (
+    COMPACTED_PREFIX, COMPACTION_SUMMARY_KEY, EXPORTS_PREFIX, FEATURE_COLUMNS, LEGACY_EXPORTS_PREFIX, RAW_HEADER,
+    TRAIN_MANIFEST_KEY, TRAIN_PREFIX, LocalStorage, compact
+)
+
+
+def raw_csv(rows):
+    """A raw-format CSV of (predictionId, feedback_timestamp, Class, V1) rows; other features are 0."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(RAW_HEADER)
+    for prediction_id, feedback_timestamp, label, v1 in rows:
+        writer.writerow([prediction_id, feedback_timestamp, label, v1] + [0] * (len(FEATURE_COLUMNS) - 1))
+    return output.getvalue()
+
+
+def legacy_csv(rows):
+    """A pre-compaction export: Class and features only, for (Class, V1) rows."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Class'] + FEATURE_COLUMNS)
+    for label, v1 in rows:
+        writer.writerow([label, v1] + [0] * (len(FEATURE_COLUMNS) - 1))
+    return output.getvalue()
+
+
+def read_train_rows(storage, summary):
+    rows = []
+    for key in summary['train_shards']:
+        rows.extend(list(csv.reader(line for line in storage.iter_lines(key) if line)))
+    return rows
+
+
+def read_compacted(storage):
+    records = {}
+    for key in storage.list_keys(COMPACTED_PREFIX):
+        for record in csv.DictReader(line for line in storage.iter_lines(key) if line):
+            records[record['predictionId']] = record
+    return records
+
+
+def test_latest_feedback_wins_and_later_export_breaks_ties(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.write(f"{COMPACTED_PREFIX}old/part-00000.csv", raw_csv([('p1', '2026-01-01T00:00:00', 0, 1.0)]))
+    storage.write(f"{EXPORTS_PREFIX}verified-data-2026-01-02.csv", raw_csv([
+        ('p1', '2026-01-02T00:00:00', 1, 2.0),
+        ('p2', '2026-01-02T00:00:00', 0, 3.0),
+    ]))
+    storage.write(f"{EXPORTS_PREFIX}verified-data-2026-01-03.csv", raw_csv([
+        ('p1', '2026-01-01T12:00:00', 0, 4.0),  # Older feedback than the first export's: loses
+        ('p2', '2026-01-02T00:00:00', 1, 5.0),  # Same feedback timestamp: the later export wins
+        ('p3', '2026-01-03T00:00:00', '', 6.0),  # No label: dropped
+    ]))
+
+    summary = compact(storage, run_id='run1')
+
+    records = read_compacted(storage)
+    assert set(records) == {'p1', 'p2'}
+    assert (records['p1']['Class'], records['p1']['V1']) == ('1', '2.0')
+    assert (records['p2']['Class'], records['p2']['V1']) == ('1', '5.0')
+    assert summary['record_count'] == 2
+    assert summary['rows_read'] == 6
+    assert summary['rows_dropped'] == 4
+
+
+def test_shards_follow_target_size_and_train_shards_have_no_header(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.write(f"{EXPORTS_PREFIX}verified-data-1.csv",
+                  raw_csv([(f"p{i}", '2026-01-01T00:00:00', i % 2, float(i)) for i in range(50)]))
+
+    summary = compact(storage, model_features=['V1', 'Amount'], target_bytes=1024, run_id='run1')
+
+    assert len(summary['train_shards']) > 1
+    assert len(summary['compacted_shards']) == len(summary['train_shards'])
+    for key in summary['compacted_shards']:
+        first_line = next(storage.iter_lines(key))
+        assert first_line.split(',') == RAW_HEADER
+    train_rows = read_train_rows(storage, summary)
+    assert len(train_rows) == 50
+    assert all(len(row) == 3 for row in train_rows)  # Class, V1, Amount
+    assert sorted(float(row[1]) for row in train_rows) == [float(i) for i in range(50)]
+
+
+def test_manifest_lists_train_shards_under_common_prefix(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.write(f"{EXPORTS_PREFIX}verified-data-1.csv",
+                  raw_csv([(f"p{i}", '2026-01-01T00:00:00', 0, float(i)) for i in range(20)]))
+
+    summary = compact(storage, target_bytes=512, run_id='run1')
+
+    manifest = json.loads(''.join(storage.iter_lines(TRAIN_MANIFEST_KEY)))
+    prefix = manifest[0]['prefix']
+    assert prefix == storage.uri(f"{TRAIN_PREFIX}run1/")
+    assert prefix.endswith('/')
+    assert manifest[1:] == [key[len(f"{TRAIN_PREFIX}run1/"):] for key in summary['train_shards']]
+    assert json.loads(''.join(storage.iter_lines(COMPACTION_SUMMARY_KEY)))['run_id'] == 'run1'
+
+
+def test_inputs_are_deleted_and_a_rerun_keeps_the_same_records(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.write(f"{EXPORTS_PREFIX}verified-data-1.csv", raw_csv([('p1', '2026-01-01T00:00:00', 1, 1.0)]))
+    first = compact(storage, run_id='run1')
+
+    storage.write(f"{EXPORTS_PREFIX}verified-data-2.csv", raw_csv([('p2', '2026-01-02T00:00:00', 0, 2.0)]))
+    second = compact(storage, run_id='run2')
+
+    assert storage.list_keys(EXPORTS_PREFIX) == []
+    assert storage.list_keys(COMPACTED_PREFIX) == second['compacted_shards']
+    assert storage.list_keys(TRAIN_PREFIX) == second['train_shards']
+    assert not set(first['train_shards']) & set(storage.list_keys(TRAIN_PREFIX))
+    assert set(read_compacted(storage)) == {'p1', 'p2'}
+
+    third = compact(storage, run_id='run3')  # Nothing new: same records, rewritten once
+    assert third['record_count'] == 2
+    assert set(read_compacted(storage)) == {'p1', 'p2'}
+
+
+def test_legacy_root_exports_are_imported_once(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    # Each legacy export was a full snapshot, so they overlap; the later one relabels V1=1.0.
+    storage.write(f"{LEGACY_EXPORTS_PREFIX}2025-01-01-00-00-00.csv", legacy_csv([(0, 1.0), (1, 2.0)]))
+    storage.write(f"{LEGACY_EXPORTS_PREFIX}2025-01-02-00-00-00.csv", legacy_csv([(1, 1.0), (1, 2.0), (0, 3.0)]))
+    storage.write(f"{EXPORTS_PREFIX}verified-data-1.csv", raw_csv([('p1', '2026-01-01T00:00:00', 0, 4.0)]))
+
+    summary = compact(storage, run_id='run1')
+
+    records = read_compacted(storage)
+    assert summary['legacy_input_count'] == 2
+    assert summary['record_count'] == 4
+    assert sorted((record['V1'], record['Class']) for record in records.values()) == [
+        ('1.0', '1'), ('2.0', '1'), ('3.0', '0'), ('4.0', '0')
+    ]
+    assert all(prediction_id.startswith('legacy-') for prediction_id in set(records) - {'p1'})
+    assert storage.list_keys(LEGACY_EXPORTS_PREFIX) == []
+
+    second = compact(storage, run_id='run2')  # The legacy rows now come from the compacted shards
+    assert second['legacy_input_count'] == 0
+    assert set(read_compacted(storage)) == set(records)
+
+
+def test_empty_bucket_writes_nothing(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+
+    assert compact(storage, run_id='run1') == {'run_id': 'run1', 'record_count': 0, 'input_count': 0}
+    assert storage.list_keys('') == []
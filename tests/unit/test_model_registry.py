@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from model_registry import SERVING_FEATURES, load_bundle, publish_bundle
+
+
+def train_booster(features):
+    rng = np.random.default_rng(0)
+    data = xgb.DMatrix(rng.random((40, len(features))), rng.integers(0, 2, 40), feature_names=features)
+    return xgb.train({'max_depth': 2}, data, num_boost_round=2)
+
+
+def test_publish_rejects_features_the_serving_path_does_not_send(tmp_path):
+    features = ['Time'] + SERVING_FEATURES
+
+    with pytest.raises(ValueError, match='Time'):
+        publish_bundle(train_booster(features), features, registry_dir=str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_published_subset_of_serving_features_loads(tmp_path):
+    features = SERVING_FEATURES[:5]
+
+    bundle_dir = publish_bundle(train_booster(features), features, registry_dir=str(tmp_path))
+
+    bundle = load_bundle(bundle_dir)
+    assert bundle.feature_order == features
+    assert len(bundle.score(np.zeros((3, len(features))))) == 3
@@ -0,0 +1,131 @@
+from resilient_invoker import CircuitBreaker, LatencyTracker, ResilientInvoker
+from simulate_endpoint_latency import FakeEndpoint
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def fallback(transaction_data):
+    return 0.0
+
+
+def make_invoker(endpoint, clock=None, hedging=False, budget_ms=1000, failure_threshold=2):
+    breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout_s=30, clock=clock or FakeClock())
+    # A warm tracker with a 10 ms p95, so hedges go out after min_hedge_delay_ms (20 ms).
+    tracker = LatencyTracker(min_samples=1)
+    for _ in range(20):
+        tracker.add(10)
+    return ResilientInvoker(endpoint, fallback, latency_budget_ms=budget_ms, hedging=hedging,
+                            breaker=breaker, latency_tracker=tracker)
+
+
+def test_fast_endpoint_scores_without_extra_attempts():
+    endpoint = FakeEndpoint(base_ms=1, plan=['ok'])
+    invoker = make_invoker(endpoint, hedging=True)
+
+    assert invoker.invoke({}) == (0.01, 'endpoint')
+    assert endpoint.calls == 1
+    assert invoker.counters['endpoint_success'] == 1
+    assert 'hedged' not in invoker.counters
+
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    endpoint = FakeEndpoint(base_ms=1, tail_ms=500, plan=['slow', 'ok'])
+    invoker = make_invoker(endpoint, hedging=True)
+
+    assert invoker.invoke({}) == (0.01, 'endpoint_hedged')
+    assert endpoint.calls == 2
+    assert invoker.counters['hedged'] == 1
+    assert invoker.counters['hedge_wins'] == 1
+
+
+def test_early_failure_is_retried_at_once():
+    endpoint = FakeEndpoint(base_ms=1, plan=['error', 'ok'])
+    invoker = make_invoker(endpoint, hedging=False)
+
+    assert invoker.invoke({}) == (0.01, 'endpoint_retried')
+    assert invoker.counters['errors'] == 1
+    assert invoker.counters['retries'] == 1
+    assert invoker.counters['retry_wins'] == 1
+    assert invoker.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_budget_exhausted_falls_back_on_timeout():
+    endpoint = FakeEndpoint(tail_ms=400, plan=['slow'])
+    invoker = make_invoker(endpoint, hedging=False, budget_ms=50)
+
+    assert invoker.invoke({}) == (0.0, 'fallback')
+    assert invoker.counters['timeouts'] == 1
+    assert invoker.counters['fallback_timeout'] == 1
+    assert invoker.breaker.consecutive_failures == 1
+
+
+def test_failed_attempts_fall_back_on_error():
+    endpoint = FakeEndpoint(plan=['error', 'error'])
+    invoker = make_invoker(endpoint)
+
+    assert invoker.invoke({}) == (0.0, 'fallback')
+    assert endpoint.calls == 2  # The primary and one retry
+    assert invoker.counters['errors'] == 2
+    assert invoker.counters['fallback_error'] == 1
+
+
+def test_breaker_opens_during_outage_and_closes_after_it():
+    clock = FakeClock()
+    endpoint = FakeEndpoint(base_ms=1, tail_ms=0, error_probability=0, tail_probability=0,
+                            outage_start_s=0, outage_length_s=10, clock=clock)
+    invoker = make_invoker(endpoint, clock=clock, failure_threshold=2)
+
+    for _ in range(2):
+        assert invoker.invoke({}) == (0.0, 'fallback')
+    assert invoker.breaker.state == CircuitBreaker.OPEN
+
+    calls_while_open = endpoint.calls
+    assert invoker.invoke({}) == (0.0, 'fallback')
+    assert endpoint.calls == calls_while_open  # Open: the endpoint is not called at all
+    assert invoker.counters['fallback_breaker_open'] == 1
+
+    clock.advance(30)  # Past the reset timeout and the outage: the half-open trial succeeds
+    assert invoker.invoke({}) == (0.01, 'endpoint')
+    assert invoker.breaker.state == CircuitBreaker.CLOSED
+    assert invoker.snapshot()['breaker_state'] == CircuitBreaker.CLOSED
+
+
+def test_failed_half_open_trial_reopens_breaker():
+    clock = FakeClock()
+    endpoint = FakeEndpoint(tail_ms=0, outage_start_s=0, outage_length_s=100, clock=clock)
+    invoker = make_invoker(endpoint, clock=clock, failure_threshold=2)
+
+    for _ in range(2):
+        invoker.invoke({})
+    clock.advance(30)
+    assert invoker.invoke({}) == (0.0, 'fallback')
+    assert invoker.breaker.state == CircuitBreaker.OPEN
+    assert invoker.breaker.opened_at == 30
+
+
+def test_breaker_lets_one_trial_through_when_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=5, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock.advance(5)
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()  # A trial is already in flight
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
@@ -0,0 +1,73 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from similar_cases import SimilarCaseIndex, build_index
+
+
+def make_index(tmp_path, rows=200):
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(rows, 29)) * rng.uniform(0.5, 50, 29)
+    features[1] = features[0]  # A duplicate transaction, as creditcard.csv has about a thousand of
+    labels = rng.integers(0, 2, rows)
+    index = build_index(str(tmp_path), features, labels, [f"r{i}" for i in range(rows)])
+    return index, features
+
+
+def test_identical_past_cases_are_kept_by_default(tmp_path):
+    index, features = make_index(tmp_path)
+
+    cases = index.search(features[0], k=3)[0]
+
+    assert [case['id'] for case in cases[:2]] == ['r0', 'r1']
+    assert cases[0]['distance'] == cases[1]['distance'] == 0.0
+    assert len(cases) == 3
+
+
+def test_excluded_ids_leave_out_the_query_itself(tmp_path):
+    index, features = make_index(tmp_path)
+
+    cases = index.search(features[5], k=4, exclude_ids=['r5'])[0]
+
+    assert 'r5' not in [case['id'] for case in cases]
+    assert len(cases) == 4
+    assert cases == sorted(cases, key=lambda case: case['distance'])
+
+
+def test_exclude_exact_drops_every_identical_case(tmp_path):
+    index, features = make_index(tmp_path)
+
+    cases = index.search(features[0], k=3, exclude_exact=True)[0]
+
+    assert not {'r0', 'r1'} & {case['id'] for case in cases}
+    assert len(cases) == 3
+    assert min(case['distance'] for case in cases) > 0
+
+
+def test_added_cases_are_searchable_after_reopening(tmp_path):
+    index, features = make_index(tmp_path)
+
+    assert index.add(features[:1] + 1, [1], ['new']) == 1
+
+    reopened = SimilarCaseIndex(str(tmp_path))
+    assert len(reopened) == 201
+    assert reopened.search(features[0] + 1, k=1)[0] == [{'id': 'new', 'label': 1, 'distance': 0.0}]
+
+
+def test_concurrent_adds_keep_vectors_labels_and_ids_aligned(tmp_path):
+    index, features = make_index(tmp_path)
+
+    def submit_feedback(i):
+        index.add(features[i:i + 1] + 1000 + i, [i % 2], [f"feedback-{i}"])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(submit_feedback, range(64)))
+
+    reopened = SimilarCaseIndex(str(tmp_path))
+    assert len(reopened) == len(reopened.ids) == 264
+    assert os.path.getsize(tmp_path / 'vectors.f32') == 264 * 29 * 4
+    assert os.path.getsize(tmp_path / 'labels.u8') == 264
+    for i in range(64):
+        case = reopened.search(features[i] + 1000 + i, k=1)[0][0]
+        assert case == {'id': f"feedback-{i}", 'label': i % 2, 'distance': 0.0}